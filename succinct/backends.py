@@ -0,0 +1,107 @@
+"""pluggable implementations of the succinct data structures.
+
+a backend names the concrete classes used to build bit vectors, bit
+vector builders, balanced parentheses encodings and elias-fano
+sequences, and the scanner used to find the structure of json
+text. two backends are registered by default:
+
+* **python**: packed bit vectors and range min-max trees in pure
+  python
+* **numpy**: the same structures, with their construction vectorized
+  using numpy (only available when numpy can be imported)
+
+unless a backend is requested explicitly, the one named by the
+SUCCINCT_BACKEND environment variable is used, falling back to the
+first available backend in DEFAULTS.
+
+"""
+
+import os
+import collections
+
+Backend = collections.namedtuple(
+    'Backend',
+    ['name', 'bitvector', 'builder', 'parentheses', 'eliasfano', 'scanner'],
+)
+
+ENVIRONMENT = 'SUCCINCT_BACKEND'
+
+DEFAULTS = ('numpy', 'python')
+
+_LOADERS = collections.OrderedDict()
+_BACKENDS = {}
+
+def register(name, loader):
+    """register a backend.
+
+    :param str name: the backend name
+    :param loader: a callable returning the Backend, or raising
+    ImportError if its dependencies are missing
+
+    """
+    _LOADERS[name] = loader
+    _BACKENDS.pop(name, None)
+
+def _load(name):
+    """return the named backend, loading it if necessary"""
+    if name not in _BACKENDS:
+        if name not in _LOADERS:
+            raise ValueError('unknown backend {}'.format(name))
+        _BACKENDS[name] = _LOADERS[name]()
+    return _BACKENDS[name]
+
+def available():
+    """return the names of the backends that can be loaded"""
+    names = []
+    for name in _LOADERS:
+        try:
+            _load(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+def get(name=None):
+    """return a backend.
+
+    :param name: the backend (or its name); defaults to the backend
+    named by SUCCINCT_BACKEND, or the first available in DEFAULTS
+    :rtype: Backend
+
+    """
+    if isinstance(name, Backend):
+        return name
+    name = name or os.environ.get(ENVIRONMENT)
+    if name:
+        return _load(name)
+    for name in DEFAULTS:
+        try:
+            return _load(name)
+        except ImportError:
+            continue
+    raise ImportError('no backend available')
+
+def _python():
+    from succinct import bitvector, encoding, scanner
+    return Backend(
+        'python',
+        bitvector.PackedBitVector,
+        bitvector.BitVectorBuilder,
+        encoding.RangeMinMaxParentheses,
+        encoding.EliasFano,
+        scanner.scan,
+    )
+
+def _numpy():
+    from succinct import vectorized
+    return Backend(
+        'numpy',
+        vectorized.NumpyBitVector,
+        vectorized.NumpyBitVectorBuilder,
+        vectorized.NumpyRangeMinMaxParentheses,
+        vectorized.NumpyEliasFano,
+        vectorized.scan,
+    )
+
+register('python', _python)
+register('numpy', _numpy)
@@ -1,3 +1,4 @@
+import array
 import collections
 
 class BitVector(collections.Sequence):
@@ -31,3 +32,532 @@ class BitVector(collections.Sequence):
     def select(self, p, k):
         """return the index of the kth instance of substring p"""
         raise NotImplementedError()
+
+def _wordtype():
+    """return the array typecode for unsigned 64-bit words"""
+    for code in ('Q', 'L'):
+        try:
+            if array.array(code).itemsize == 8:
+                return code
+        except ValueError:
+            continue
+    raise RuntimeError('platform has no 64-bit array type')
+
+WORDTYPE = _wordtype()
+
+MASK64 = (1 << 64) - 1
+ONES8 = 0x0101010101010101
+MSBS8 = 0x8080808080808080
+
+# position of the rth set bit of byte b, indexed by b | (r << 8)
+SELECT8 = [
+    ([j for j in xrange(8) if b >> j & 1] + [8] * 8)[r]
+    for r in xrange(8)
+    for b in xrange(256)
+]
+
+def popcount(w):
+    """return the number of set bits in word w"""
+    return bin(w).count('1')
+
+def select64(w, r):
+    """return the position of the (r + 1)th set bit in 64-bit word w.
+
+    this is the broadword algorithm from vigna's `"broadword
+    implementation of rank/select queries"
+    <http://vigna.di.unimi.it/ftp/papers/Broadword.pdf>`_: byte-wise
+    popcounts are summed in parallel to locate the byte containing the
+    bit, which is then resolved with a lookup table.
+
+    """
+    s = w - ((w >> 1) & 0x5555555555555555)
+    s = (s & 0x3333333333333333) + ((s >> 2) & 0x3333333333333333)
+    s = (((s + (s >> 4)) & 0x0F0F0F0F0F0F0F0F) * ONES8) & MASK64
+    place = popcount(((r * ONES8 | MSBS8) - s) & MSBS8) * 8
+    r -= ((s << 8) >> place) & 0xFF
+    return place + SELECT8[((w >> place) & 0xFF) | (r << 8)]
+
+class RankSelect(object):
+    """rank directory and sampled select index over a word sequence.
+
+    the directory stores the absolute number of set bits preceding
+    every superblock, and the number preceding every block relative to
+    its superblock. select samples record the superblock containing
+    every SAMPLE-th set bit (and, optionally, every SAMPLE-th unset
+    bit). words are read through a callable so that the same index can
+    be built over derived words, e.g. the masks of two-bit patterns.
+
+    """
+
+    def __init__(self, word, nbits, zeros=False,
+                 block=8, superblock=64, sample=1024):
+        """build the index.
+
+        :param word: callable returning the jth 64-bit word; bits at
+        or beyond nbits must be unset
+        :param int nbits: the number of bits covered
+        :param bool zeros: also sample unset bits for select
+        :param int block: words per block
+        :param int superblock: words per superblock
+        :param int sample: occurrences per select sample
+
+        """
+        self.word = word
+        self.nbits = nbits
+        self.block = block
+        self.superblock = superblock
+        self.sample = sample
+        self.supers, self.blocks, self.samples = self._build(zeros)
+
+    def _save(self, store, name):
+        """save the index to a storage.Store"""
+        for field in ('nbits', 'block', 'superblock', 'sample'):
+            store.put('{}.{}'.format(name, field), getattr(self, field))
+        store.put(name + '.supers', self.supers)
+        store.put(name + '.blocks', self.blocks)
+        for bit in ('0', '1'):
+            store.put('{}.samples.{}'.format(name, bit), self.samples[bit])
+
+    @classmethod
+    def _load(cls, store, name, word):
+        """restore an index saved by _save, without rebuilding it"""
+        idx = cls.__new__(cls)
+        idx.word = word
+        for field in ('nbits', 'block', 'superblock', 'sample'):
+            setattr(idx, field, store.get('{}.{}'.format(name, field)))
+        idx.supers = store.get(name + '.supers')
+        idx.blocks = store.get(name + '.blocks')
+        idx.samples = dict(
+            (bit, store.get('{}.samples.{}'.format(name, bit)))
+            for bit in ('0', '1')
+        )
+        return idx
+
+    def _build(self, zeros):
+        """return the superblock counts, block counts and samples"""
+        block, superblock, sample = self.block, self.superblock, self.sample
+        nwords = (self.nbits + 63) / 64
+        supers, blocks = array.array(WORDTYPE), array.array('H')
+        samples = {'0': array.array('I'), '1': array.array('I')}
+        nxt = {'0': 1, '1': 1}
+        total = relative = 0
+        for idx in xrange(nwords):
+            if idx % superblock == 0:
+                total += relative
+                relative = 0
+                supers.append(total)
+            if idx % block == 0:
+                blocks.append(relative)
+            relative += popcount(self.word(idx))
+            counts = {'1': total + relative}
+            if zeros:
+                counts['0'] = (
+                    min(self.nbits, (idx + 1) * 64) - total - relative
+                )
+            for bit, cnt in counts.items():
+                while nxt[bit] <= cnt:
+                    samples[bit].append(idx / superblock)
+                    nxt[bit] += sample
+        supers.append(total + relative)
+        return supers, blocks, samples
+
+    def count(self, bit='1'):
+        """return the number of set (or unset) bits"""
+        ones = self.supers[-1]
+        return ones if bit == '1' else self.nbits - ones
+
+    def rank(self, i):
+        """return the number of set bits at or before i"""
+        w = i / 64
+        b = w / self.block
+        cnt = self.supers[w / self.superblock] + self.blocks[b]
+        for j in xrange(b * self.block, w):
+            cnt += popcount(self.word(j))
+        return cnt + popcount(self.word(w) & ((2 << (i % 64)) - 1))
+
+    def select(self, k, bit='1'):
+        """return the index of the kth set (or unset) bit"""
+        if k > self.count(bit):
+            raise ValueError(
+                'vector has {} {}s (not {})'.format(self.count(bit), bit, k)
+            )
+
+        blocks = self.superblock / self.block
+        if bit == '1':
+            def before(s):
+                return self.supers[s]
+
+            def inblock(b):
+                return self.blocks[b]
+
+            word = self.word
+        else:
+            def before(s):
+                return s * self.superblock * 64 - self.supers[s]
+
+            def inblock(b):
+                return b % blocks * self.block * 64 - self.blocks[b]
+
+            def word(j):
+                return ~self.word(j) & MASK64
+
+        # binary search the superblocks between neighbouring samples
+        samples = self.samples[bit]
+        j = (k - 1) / self.sample
+        lo = samples[j]
+        hi = samples[j + 1] if j + 1 < len(samples) else len(self.supers) - 2
+        while lo < hi:
+            mid = (lo + hi + 1) / 2
+            if before(mid) < k:
+                lo = mid
+            else:
+                hi = mid - 1
+        k -= before(lo)
+
+        # scan the blocks of the superblock
+        b = lo * blocks
+        end = min(b + blocks, len(self.blocks))
+        while b + 1 < end and inblock(b + 1) < k:
+            b += 1
+        k -= inblock(b)
+
+        # scan the words of the block
+        w = b * self.block
+        while True:
+            c = popcount(word(w))
+            if k <= c:
+                break
+            k -= c
+            w += 1
+        return w * 64 + select64(word(w), k - 1)
+
+class PackedBitVector(BitVector):
+    """bit vector packed into 64-bit words with rank/select indexes.
+
+    bit i is stored in bit (i % 64) of word (i / 64). rank queries
+    take constant time using a two-level directory: the absolute
+    number of ones preceding every superblock, and the number of ones
+    preceding every block relative to its superblock. with the default
+    geometry (512-bit blocks, 4096-bit superblocks) the directory adds
+    under 5% to the size of the vector.
+
+    select queries use the superblock containing every SAMPLE-th one
+    (and zero) to narrow a binary search over the directory, then scan
+    at most one block and finish with a broadword select within the
+    word. the samples add a further ~3%.
+
+    the two-bit patterns '10' and '01' (i.e., '()' and ')(' in
+    balanced parentheses) get their own directories, built over the
+    masks w & ~(w >> 1) and ~w & (w >> 1) with the carry from the next
+    word, so they also support constant-time rank and select. other
+    patterns fall back to scanning.
+
+    indexes are (re)built lazily on the first query following a
+    modification.
+
+    """
+
+    WORD = 64
+    BLOCK = 8  # words per block
+    SUPERBLOCK = 64  # words per superblock
+    SAMPLE = 1024  # occurrences per select sample
+
+    def __init__(self, bits=''):  # pylint: disable=W0231
+        self._words = array.array(WORDTYPE)
+        self._len = 0
+        self._indexes = {}
+        if isinstance(bits, basestring):
+            self._fromstring(bits)
+        else:
+            self.extend(bits)
+
+    @classmethod
+    def fromwords(cls, words, nbits):
+        """return a vector of nbits bits packed in words (not copied)"""
+        if len(words) != (nbits + cls.WORD - 1) / cls.WORD:
+            raise ValueError('{} words cannot hold {} bits'.format(
+                len(words), nbits
+            ))
+        bv = cls()
+        bv._words, bv._len = words, nbits  # pylint: disable=W0212
+        return bv
+
+    def _save(self, store, name):
+        """save the vector and its indexes to a storage.Store"""
+        store.put(name + '.len', self._len)
+        store.put(name + '.words', self._words)
+        store.put(name + '.indexes', sorted(self._indexes))
+        for p, idx in self._indexes.items():
+            idx._save(store, '{}.index.{}'.format(name, p))
+
+    @classmethod
+    def _load(cls, store, name):
+        """restore a vector saved by _save, using the stored arrays in
+        place"""
+        bv = cls.fromwords(
+            store.get(name + '.words'), store.get(name + '.len')
+        )
+        for p in store.get(name + '.indexes'):
+            bv._indexes[p] = RankSelect._load(  # pylint: disable=W0212
+                store, '{}.index.{}'.format(name, p), bv._patternword(p)
+            )
+        return bv
+
+    def _fromstring(self, bits):
+        """append a string of 0s and 1s to the vector"""
+        if not all(b in '01' for b in bits):
+            raise ValueError('bits must be a string of 0s and 1s')
+        head = -self._len % self.WORD
+        for bit in bits[:head]:
+            self.append(bit)
+        bits = bits[head:]
+        for idx in xrange(0, len(bits), self.WORD):
+            chunk = bits[idx:idx + self.WORD]
+            self._words.append(int(chunk[::-1], 2))
+            self._len += len(chunk)
+        self._invalidate()
+
+    def _invalidate(self):
+        """discard the indexes after a modification"""
+        self._indexes = {}
+
+    def _checkindex(self, i):
+        if i < 0 or i >= len(self):
+            raise IndexError('index out of range')
+
+    def _checkcount(self, k):
+        if k <= 0 or k > len(self):
+            raise ValueError('count out of range')
+
+    def _checkpattern(self, p):
+        if not isinstance(p, basestring) or not p or not all(
+                b in '01' for b in p
+        ):
+            raise ValueError('pattern must be a string of 0s and 1s')
+
+    @property
+    def words(self):
+        """the underlying 64-bit words, least significant bit first"""
+        return self._words
+
+    def ones(self):
+        """iterate the positions of the set bits"""
+        for idx, w in enumerate(self._words):
+            while w:
+                low = w & -w
+                yield idx * self.WORD + low.bit_length() - 1
+                w ^= low
+
+    def rankdirectory(self):
+        """return the rank/select index of the set bits (a RankSelect),
+        building it on first use"""
+        return self._index('1')
+
+    def __len__(self):
+        return self._len
+
+    def __str__(self):
+        return ''.join(
+            '{:064b}'.format(w)[::-1] for w in self._words
+        )[:self._len]
+
+    def __iter__(self):
+        return iter(str(self))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, stride = i.indices(len(self))
+            if stride != 1:
+                return ''.join(self[j] for j in xrange(start, stop, stride))
+            return ''.join(
+                '{:064b}'.format(w)[::-1]
+                for w in self._words[start / self.WORD:
+                                     (stop + self.WORD - 1) / self.WORD]
+            )[start % self.WORD:start % self.WORD + max(stop - start, 0)]
+        if i < 0:
+            i += len(self)
+        self._checkindex(i)
+        w = self._words[i / self.WORD]
+        return '1' if w >> (i % self.WORD) & 1 else '0'
+
+    def append(self, bit):
+        if bit not in ('0', '1'):
+            raise ValueError('bit must be 0 or 1')
+        if self._len % self.WORD == 0:
+            self._words.append(0)
+        if bit == '1':
+            self._words[-1] |= 1 << (self._len % self.WORD)
+        self._len += 1
+        self._invalidate()
+
+    def extend(self, bits):
+        if isinstance(bits, basestring):
+            self._fromstring(bits)
+        else:
+            super(PackedBitVector, self).extend(bits)
+
+    def _carry(self, j):
+        """return the bit following word j, and the mask of its valid
+        pattern positions (the last bit cannot start a 2-bit pattern)"""
+        if j + 1 < len(self._words):
+            return (self._words[j + 1] & 1) << 63, MASK64
+        return 0, (1 << (self._len - j * self.WORD - 1)) - 1
+
+    def _word10(self, j):
+        """return the mask of '10' patterns starting in word j"""
+        w = self._words[j]
+        carry, valid = self._carry(j)
+        return w & ~((w >> 1) | carry) & valid
+
+    def _word01(self, j):
+        """return the mask of '01' patterns starting in word j"""
+        w = self._words[j]
+        carry, valid = self._carry(j)
+        return ~w & ((w >> 1) | carry) & valid
+
+    def _index(self, p):
+        """return the rank/select index for pattern p"""
+        if p not in self._indexes:
+            self._indexes[p] = self._buildindex(p)
+        return self._indexes[p]
+
+    def _patternword(self, p):
+        """return a callable giving the jth word of the mask of p"""
+        return {
+            '1': self._words.__getitem__,
+            '10': self._word10,
+            '01': self._word01,
+        }[p]
+
+    def _buildindex(self, p):
+        """build the rank/select index for pattern p"""
+        return RankSelect(
+            self._patternword(p), self._len,
+            zeros=p == '1',
+            block=self.BLOCK,
+            superblock=self.SUPERBLOCK,
+            sample=self.SAMPLE,
+        )
+
+    def _occurrences(self, p):
+        """iterate the (possibly overlapping) positions of pattern p"""
+        bits, idx = str(self), -1
+        while True:
+            idx = bits.find(p, idx + 1)
+            if idx < 0:
+                break
+            yield idx
+
+    def rank(self, p, i):
+        self._checkindex(i)
+        self._checkpattern(p)
+
+        if p in ('1', '10', '01'):
+            return self._index(p).rank(i)
+        if p == '0':
+            return i + 1 - self._index('1').rank(i)
+        return sum(1 for idx in self._occurrences(p) if idx <= i)
+
+    def select(self, p, k):
+        self._checkcount(k)
+        self._checkpattern(p)
+
+        if p in ('1', '10', '01'):
+            return self._index(p).select(k)
+        if p == '0':
+            return self._index('1').select(k, '0')
+        cnt = k
+        for idx in self._occurrences(p):
+            cnt -= 1
+            if cnt == 0:
+                return idx
+        raise ValueError('vector has {} {}s (not {})'.format(k - cnt, p, k))
+
+class BitVectorBuilder(object):
+    """incrementally builds a PackedBitVector.
+
+    bits, runs of bits, and whole words are accumulated in a growable
+    word buffer in amortized constant time per word. freeze() hands the
+    buffer to a new PackedBitVector and builds its indexes once, so
+    construction is linear in the number of bits and never copies the
+    buffer.
+
+    """
+
+    def __init__(self, cls=PackedBitVector):
+        self._cls = cls
+        self._words = array.array(WORDTYPE)
+        self._word = 0  # pending bits not yet flushed to _words
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def _flush(self):
+        """move a complete pending word to the buffer"""
+        self._words.append(self._word)
+        self._word = 0
+
+    def append(self, bit):
+        """append a single bit"""
+        if bit == '1':
+            self._word |= 1 << (self._len % 64)
+        elif bit != '0':
+            raise ValueError('bit must be 0 or 1')
+        self._len += 1
+        if self._len % 64 == 0:
+            self._flush()
+
+    def extend(self, bits):
+        """append a string (or iterable) of bits"""
+        for bit in bits:
+            self.append(bit)
+
+    def appendrun(self, bit, n):
+        """append n copies of bit"""
+        if bit not in ('0', '1'):
+            raise ValueError('bit must be 0 or 1')
+        while n > 0:
+            m = min(n, 64 - self._len % 64)
+            self.appendword(((1 << m) - 1) if bit == '1' else 0, m)
+            n -= m
+
+    def appendword(self, w, nbits=64):
+        """append the low nbits bits of w, least significant first"""
+        if nbits < 0 or nbits > 64:
+            raise ValueError('nbits must be between 0 and 64')
+        w &= (1 << nbits) - 1
+        offset = self._len % 64
+        self._word |= (w << offset) & MASK64
+        self._len += nbits
+        if offset + nbits >= 64:
+            self._flush()
+            self._word = w >> (64 - offset)
+
+    def appendwords(self, words, nbits):
+        """append nbits bits packed in words, least significant first"""
+        full, rest = nbits / 64, nbits % 64
+        if self._len % 64 == 0:
+            self._words.extend(words[:full])
+            self._len += full * 64
+        else:
+            for idx in xrange(full):
+                self.appendword(words[idx])
+        if rest:
+            self.appendword(words[full], rest)
+
+    def freeze(self, index=True):
+        """return the bit vector built so far, and reset the builder.
+
+        :param bool index: build the rank/select index now rather than
+        on first use
+
+        """
+        words, nbits = self._words, self._len
+        if nbits % 64:
+            words.append(self._word)
+        self._words, self._word, self._len = array.array(WORDTYPE), 0, 0
+        bv = self._cls.fromwords(words, nbits)
+        if index:
+            bv.rankdirectory()
+        return bv
@@ -1,7 +1,12 @@
+import array
 import numbers
+import itertools
 import collections
 
-from succinct import bitvector
+from succinct import (
+    backends,
+    bitvector,
+)
 
 def tobits(p):
     """convert parentheses to bits"""
@@ -11,6 +16,32 @@ def toparens(b):
     """convert bits to parentheses"""
     return b.replace('1', '(').replace('0', ')')
 
+def _bytetables():
+    """return per-byte excess tables, reading bits least significant first.
+
+    for each byte value, give the total change in excess, the minimum
+    and maximum prefix excess (over prefixes of length 1 to 8), the
+    number of prefixes achieving the minimum, and the offsets of the
+    first minimum and maximum.
+
+    """
+    tables = ([], [], [], [], [], [])
+    for byte in xrange(256):
+        e, lo, hi, cnt, first, last = 0, 9, -9, 0, 0, 0
+        for j in xrange(8):
+            e += 1 if byte >> j & 1 else -1
+            if e < lo:
+                lo, cnt, first = e, 1, j
+            elif e == lo:
+                cnt += 1
+            if e > hi:
+                hi, last = e, j
+        for table, val in zip(tables, (e, lo, hi, cnt, first, last)):
+            table.append(val)
+    return tables
+
+DELTA, MINPREFIX, MAXPREFIX, NUMMIN, FIRSTMIN, FIRSTMAX = _bytetables()
+
 class BalancedParentheses(collections.Sequence):
     """models an ordinal tree as a sequence of balanced parantheses.
 
@@ -30,39 +61,63 @@ class BalancedParentheses(collections.Sequence):
     """
     # pylint: disable=W0231
 
-    def __init__(self, bv):
+    def __init__(self, bv, trusted=False):
+        """instantiate an encoding.
+
+        :param bitvector.BitVector bv: the encoding bits
+        :param bool trusted: skip validation (e.g., for encodings
+        produced by our own builders)
+
+        """
         assert isinstance(bv, bitvector.BitVector)
         self.bv = bv
 
-        if not self._balanced():
+        if not trusted and not self._balanced():
             raise ValueError("encoding '{}' not balanced".format(self))
 
+    def _save(self, store, name):
+        """save the encoding to a storage.Store"""
+        self.bv._save(store, name + '.bv')  # pylint: disable=W0212
+
+    @classmethod
+    def _load(cls, store, name, vector=bitvector.PackedBitVector):
+        """restore an encoding saved by _save, without validating it.
+
+        :param vector: the class of the restored bit vector
+
+        """
+        enc = cls.__new__(cls)
+        enc.bv = vector._load(store, name + '.bv')  # pylint: disable=W0212
+        return enc
+
     def _balanced(self):
-        """return True iff parentheses are balanced"""
-        ok = len(self) and len(self) % 2 == 0
-        ok = ok and self[0] == '(' and self[-1] == ')'
-        ok = ok and all(self.excess(i) >= 0 for i in range(len(self)))
-        ok = ok and self.excess(len(self) - 1) == 0
-        ok = ok and all(
-            abs(self.excess(i) - self.excess(i - 1)) == 1
-            for i in range(1, len(self))
-        )
-        for i in range(len(self)):
-            if not ok:
-                break
-            if self[i] != '(':
-                continue
-            close = self.close(i)
-            ok = ok and close > i
-            ok = ok and self.excess(close) == self.excess(i) - 1
-            for m in range(i + 1, close):
-                if not ok:
-                    break
-                if self[m] != '(':
-                    continue
-                ok = ok and self.close(m) < close
-                ok = ok and self.excess(m) >= self.excess(i)
-        return ok
+        """return True iff parentheses are balanced.
+
+        this makes a single pass over the encoding, checking that the
+        running excess never drops below zero and ends at zero. packed
+        vectors are checked a byte at a time.
+
+        """
+        n, e = len(self), 0
+        if not n or n % 2:
+            return False
+        if isinstance(self.bv, bitvector.PackedBitVector):
+            words, full = self.bv.words, n / 64
+            for j in xrange(full):
+                w = words[j]
+                for shift in xrange(0, 64, 8):
+                    byte = w >> shift & 0xFF
+                    if e + MINPREFIX[byte] < 0:
+                        return False
+                    e += DELTA[byte]
+            bits = self.bv[full * 64:]
+        else:
+            bits = str(self.bv)
+        for bit in bits:
+            e += 1 if bit == '1' else -1
+            if e < 0:
+                return False
+        return e == 0
 
     def __str__(self):
         return toparens(str(self.bv))
@@ -132,30 +187,749 @@ class BalancedParentheses(collections.Sequence):
         """return the position of the kth minimum excess"""
         raise NotImplementedError()
 
+class RangeMinMaxParentheses(BalancedParentheses):
+    """balanced parentheses backed by a range min-max tree.
+
+    the encoding is divided into blocks of BLOCK bits. a complete
+    binary tree over the blocks stores, for every node, the minimum
+    and maximum excess in its range and the number of times the
+    minimum occurs. searches scan at most two blocks (a byte at a time
+    using lookup tables) and otherwise walk the tree, so fwdsearch,
+    bwdsearch, firstmin, firstmax, countmin and selectmin all take
+    O(log n) time.
+
+    for more details, see `"fully-functional succinct trees"
+    <http://dl.acm.org/citation.cfm?id=1873601.1873613>`_.
+
+    """
+
+    BLOCK = 512  # bits per leaf
+
+    INF = 2 ** 31 - 1
+
+    def __init__(self, bv, trusted=False):
+        assert isinstance(bv, bitvector.BitVector)
+        if not isinstance(bv, bitvector.PackedBitVector):
+            bv = bitvector.PackedBitVector(str(bv))
+        self.bv = bv
+        self._build()
+        super(RangeMinMaxParentheses, self).__init__(bv, trusted)
+
+    def _save(self, store, name):
+        super(RangeMinMaxParentheses, self)._save(store, name)
+        store.put(name + '.block', self.BLOCK)
+        store.put(name + '.size', self._size)
+        store.put(name + '.mins', self._mins)
+        store.put(name + '.maxs', self._maxs)
+        store.put(name + '.nmins', self._nmins)
+
+    @classmethod
+    def _load(cls, store, name, vector=bitvector.PackedBitVector):
+        if store.get(name + '.block') != cls.BLOCK:
+            raise ValueError('index has a different block size')
+        enc = super(RangeMinMaxParentheses, cls)._load(store, name, vector)
+        enc._size = store.get(name + '.size')
+        enc._mins = store.get(name + '.mins')
+        enc._maxs = store.get(name + '.maxs')
+        enc._nmins = store.get(name + '.nmins')
+        return enc
+
+    def _balanced(self):
+        # the root summarizes the whole encoding
+        return bool(
+            len(self) and len(self) % 2 == 0 and
+            self._mins[1] >= 0 and self._before(len(self)) == 0
+        )
+
+    def _build(self):
+        """construct the range min-max tree"""
+        nblocks = max(1, (len(self) + self.BLOCK - 1) / self.BLOCK)
+        size = 1
+        while size < nblocks:
+            size *= 2
+        mins = array.array('i', [self.INF]) * (2 * size)
+        maxs = array.array('i', [-self.INF]) * (2 * size)
+        nmins = array.array('i', [0]) * (2 * size)
+
+        e = 0
+        for block in xrange(nblocks):
+            a, b = self._blockrange(block)
+            if a > b:
+                break
+            mn, _, nmn, mx, _, e = self._summarize(a, b, e)
+            mins[size + block], nmins[size + block] = mn, nmn
+            maxs[size + block] = mx
+        for v in xrange(size - 1, 0, -1):
+            l, r = 2 * v, 2 * v + 1
+            mins[v], maxs[v] = min(mins[l], mins[r]), max(maxs[l], maxs[r])
+            nmins[v] = (
+                (nmins[l] if mins[l] == mins[v] else 0) +
+                (nmins[r] if mins[r] == mins[v] else 0)
+            )
+        self._size = size
+        self._mins, self._maxs, self._nmins = mins, maxs, nmins
+
+    def _blockrange(self, block):
+        """return the first and last positions of block"""
+        a = block * self.BLOCK
+        return a, min(len(self), a + self.BLOCK) - 1
+
+    def _checkrange(self, i, j):
+        if i < 0 or j < 0 or i >= len(self) or j >= len(self):
+            raise IndexError('index out of range')
+        if i > j:
+            raise ValueError('{} > {}'.format(i, j))
+
+    def _before(self, i):
+        """return excess(i - 1), where excess(-1) == 0"""
+        return 0 if i == 0 else 2 * self.bv.rank('1', i - 1) - i
+
+    def _bit(self, i):
+        """return +1 if position i is '(' and -1 otherwise"""
+        return 1 if self.bv.words[i >> 6] >> (i & 63) & 1 else -1
+
+    def _byte(self, i):
+        """return the (aligned) byte starting at position i"""
+        return self.bv.words[i >> 6] >> (i & 63) & 0xFF
+
+    def _summarize(self, a, b, e):
+        """summarize excess(a) ... excess(b) given e == excess(a - 1).
+
+        returns the minimum, its first position, its number of
+        occurrences, the maximum, its first position, and excess(b).
+
+        """
+        mn, mnpos, nmn, mx, mxpos = self.INF, None, 0, -self.INF, None
+        p = a
+        while p <= b:
+            if p & 7 == 0 and p + 7 <= b:
+                byte = self._byte(p)
+                lo, hi = e + MINPREFIX[byte], e + MAXPREFIX[byte]
+                if lo < mn:
+                    mn, mnpos, nmn = lo, p + FIRSTMIN[byte], NUMMIN[byte]
+                elif lo == mn:
+                    nmn += NUMMIN[byte]
+                if hi > mx:
+                    mx, mxpos = hi, p + FIRSTMAX[byte]
+                e += DELTA[byte]
+                p += 8
+            else:
+                e += self._bit(p)
+                if e < mn:
+                    mn, mnpos, nmn = e, p, 1
+                elif e == mn:
+                    nmn += 1
+                if e > mx:
+                    mx, mxpos = e, p
+                p += 1
+        return mn, mnpos, nmn, mx, mxpos, e
+
+    def _fwdscan(self, a, b, e, t):
+        """return min{a <= j <= b, excess(j) = t} given e == excess(a - 1)"""
+        p = a
+        while p <= b:
+            if p & 7 == 0 and p + 7 <= b:
+                byte = self._byte(p)
+                if not e + MINPREFIX[byte] <= t <= e + MAXPREFIX[byte]:
+                    e += DELTA[byte]
+                    p += 8
+                    continue
+            e += self._bit(p)
+            if e == t:
+                return p
+            p += 1
+        return None
+
+    def _bwdscan(self, a, b, e, t):
+        """return max{a <= j <= b, excess(j) = t} given e == excess(b)"""
+        p = b
+        while p >= a:
+            if p & 7 == 7 and p - 7 >= a:
+                byte = self._byte(p - 7)
+                before = e - DELTA[byte]
+                if not before + MINPREFIX[byte] <= t <= \
+                        before + MAXPREFIX[byte]:
+                    e = before
+                    p -= 8
+                    continue
+            if e == t:
+                return p
+            e -= self._bit(p)
+            p -= 1
+        return None
+
+    def _contains(self, v, t):
+        """return True iff excess t occurs in the range of node v"""
+        return self._mins[v] <= t <= self._maxs[v]
+
+    def fwdsearch(self, i, d):
+        # allow i == -1 so we can scan the entire array
+        if i < -1 or i >= len(self):
+            raise IndexError('index out of range')
+        e = self._before(i + 1)
+        t = e + d
+        if i + 1 < len(self):
+            block = (i + 1) / self.BLOCK
+            j = self._fwdscan(i + 1, self._blockrange(block)[1], e, t)
+            if j is not None:
+                return j
+            v = self._size + block
+            while v > 1:
+                if v % 2 == 0 and self._contains(v + 1, t):
+                    v += 1
+                    while v < self._size:
+                        v = 2 * v if self._contains(2 * v, t) else 2 * v + 1
+                    a, b = self._blockrange(v - self._size)
+                    return self._fwdscan(a, b, self._before(a), t)
+                v /= 2
+        raise ValueError('excess({}) not found after {}'.format(t, i))
+
+    def bwdsearch(self, i, d):
+        # allow i == len(self) so we can scan entire array
+        if i < 0 or i > len(self):
+            raise IndexError('index out of range')
+        e = self._before(i)
+        t = d + (0 if i == len(self) else e + self._bit(i))
+        if i > 0:
+            block = (i - 1) / self.BLOCK
+            j = self._bwdscan(block * self.BLOCK, i - 1, e, t)
+            if j is not None:
+                return j
+            v = self._size + block
+            while v > 1:
+                if v % 2 == 1 and self._contains(v - 1, t):
+                    v -= 1
+                    while v < self._size:
+                        v = 2 * v + (1 if self._contains(2 * v + 1, t) else 0)
+                    a, b = self._blockrange(v - self._size)
+                    return self._bwdscan(a, b, self._before(b + 1), t)
+                v /= 2
+        # special case: excess[-1] == 0
+        if t == 0:
+            return -1
+        raise ValueError('excess({}) not found before {}'.format(t, i))
+
+    def _segments(self, i, j):
+        """decompose [i, j] into partial blocks and tree nodes.
+
+        yields (a, b, None) for a partial block covering a ... b, and
+        (None, None, v) for tree node v, in left-to-right order.
+
+        """
+        first, last = i / self.BLOCK, j / self.BLOCK
+        if first == last:
+            yield i, j, None
+            return
+        yield i, self._blockrange(first)[1], None
+        lo, hi = self._size + first + 1, self._size + last - 1
+        left, right = [], []
+        while lo <= hi:
+            if lo % 2 == 1:
+                left.append(lo)
+                lo += 1
+            if hi % 2 == 0:
+                right.append(hi)
+                hi -= 1
+            lo, hi = lo / 2, hi / 2
+        for v in left + right[::-1]:
+            yield None, None, v
+        yield last * self.BLOCK, j, None
+
+    def _minimum(self, i, j):
+        """return the minimum excess in [i, j] and its segments"""
+        segments, mn = [], self.INF
+        for a, b, v in self._segments(i, j):
+            if v is None:
+                summary = self._summarize(a, b, self._before(a))
+                lo, cnt = summary[0], summary[2]
+            else:
+                lo, cnt = self._mins[v], self._nmins[v]
+            segments.append((a, b, v, lo, cnt))
+            mn = min(mn, lo)
+        return mn, segments
+
+    def firstmin(self, i, j):
+        self._checkrange(i, j)
+        mn, segments = self._minimum(i, j)
+        for a, b, v, lo, _ in segments:
+            if lo != mn:
+                continue
+            if v is not None:
+                while v < self._size:
+                    v = 2 * v + (0 if self._mins[2 * v] == mn else 1)
+                a, b = self._blockrange(v - self._size)
+            return self._summarize(a, b, self._before(a))[1]
+
+    def firstmax(self, i, j):
+        self._checkrange(i, j)
+        best, mx = None, -self.INF
+        for a, b, v in self._segments(i, j):
+            hi = (
+                self._summarize(a, b, self._before(a))[3]
+                if v is None else
+                self._maxs[v]
+            )
+            if hi > mx:
+                best, mx = (a, b, v), hi
+        a, b, v = best
+        if v is not None:
+            while v < self._size:
+                v = 2 * v + (0 if self._maxs[2 * v] == mx else 1)
+            a, b = self._blockrange(v - self._size)
+        return self._summarize(a, b, self._before(a))[4]
+
+    def countmin(self, i, j):
+        self._checkrange(i, j)
+        mn, segments = self._minimum(i, j)
+        return sum(cnt for _, _, _, lo, cnt in segments if lo == mn)
+
+    def selectmin(self, i, j, k):
+        self._checkrange(i, j)
+        mn, segments = self._minimum(i, j)
+        if k > 0:
+            cnt = k
+            for a, b, v, lo, num in segments:
+                if lo != mn:
+                    continue
+                if cnt > num:
+                    cnt -= num
+                    continue
+                if v is not None:
+                    while v < self._size:
+                        v *= 2
+                        num = self._nmins[v] if self._mins[v] == mn else 0
+                        if cnt > num:
+                            cnt -= num
+                            v += 1
+                    a, b = self._blockrange(v - self._size)
+                return self._selectscan(a, b, mn, cnt)
+        raise ValueError('range has no minrank {}'.format(k))
+
+    def _selectscan(self, a, b, mn, k):
+        """return the position of the kth occurrence of excess mn in
+        [a, b], which must exist"""
+        e, p = self._before(a), a
+        while True:
+            if p & 7 == 0 and p + 7 <= b:
+                byte = self._byte(p)
+                if e + MINPREFIX[byte] != mn or NUMMIN[byte] < k:
+                    if e + MINPREFIX[byte] == mn:
+                        k -= NUMMIN[byte]
+                    e += DELTA[byte]
+                    p += 8
+                    continue
+            e += self._bit(p)
+            if e == mn:
+                k -= 1
+                if k == 0:
+                    return p
+            p += 1
+
+def _values(data):
+    """return the length, universe and values of a monotone sequence.
+
+    data is either a sequence of integers or a bit vector giving the
+    positions of its ones.
+
+    """
+    if isinstance(data, bitvector.BitVector):
+        universe = len(data)
+        if isinstance(data, bitvector.PackedBitVector):
+            n = data.rank('1', universe - 1) if universe else 0
+            return n, universe, data.ones()
+        n = str(data).count('1')
+        return n, universe, (
+            idx for idx, val in enumerate(data) if val == '1'
+        )
+    if not isinstance(data, collections.Sequence):
+        data = list(data)
+    return len(data), data[-1] + 1 if data else 0, iter(data)
+
+def _width(n, universe):
+    """return the number of low bits for n values in [0, universe)"""
+    width = 0
+    while n and universe >> (width + 1) >= n:
+        width += 1
+    return width
+
+def _readbits(words, pos, width):
+    """return the width bits of words starting at bit pos"""
+    if not width:
+        return 0
+    w, off = pos >> 6, pos & 63
+    val = words[w] >> off
+    if off + width > 64:
+        val |= words[w + 1] << (64 - off)
+    return val & ((1 << width) - 1)
+
+def _ones(words, pos):
+    """iterate the positions of the set bits of words from bit pos"""
+    idx = pos >> 6
+    w = words[idx] >> (pos & 63) << (pos & 63)
+    while True:
+        while not w:
+            idx += 1
+            w = words[idx]
+        low = w & -w
+        yield idx * 64 + low.bit_length() - 1
+        w ^= low
+
 class EliasFano(collections.Sequence):
+    """a non-decreasing sequence of integers in elias-fano representation.
+
+    given n values drawn from a universe of size u, each value is
+    split into its low l = floor(log(u / n)) bits, which are stored
+    verbatim in a packed array, and its remaining high bits, which
+    are stored in unary in a bit vector: the ith value sets bit
+    (high + i). this takes at most 2 + ceil(log(u / n)) bits per value,
+    and the ith value is recovered in constant time by a select on the
+    high bits.
+
+    for more details, see `"quasi-succinct indices"
+    <http://vigna.di.unimi.it/ftp/papers/QuasiSuccinctIndices.pdf>`_.
 
-    def __init__(self, data):  # pylint: disable=W0231
-        if isinstance(data, bitvector.BitVector):
-            data = [idx for idx, val in enumerate(data) if val == '1']
-        assert all(isinstance(val, numbers.Integral) for val in data)
-        self.data = data
+    """
+
+    def __init__(self, data, backend=None):  # pylint: disable=W0231
+        """encode a sequence.
+
+        :param data: a non-decreasing sequence of non-negative
+        integers, or a bit vector giving the positions of its ones
+        :param backend: the backend (or its name) used to build the
+        high bits; see backends.get
+
+        """
+        n, universe, data = _values(data)
+        width = _width(n, universe)
+
+        builder = backends.get(backend).builder
+        lows, highs = bitvector.BitVectorBuilder(), builder()
+        prev = 0
+        for val in data:
+            assert isinstance(val, numbers.Integral)
+            if val < prev:
+                raise ValueError('values must be non-negative and sorted')
+            if width:
+                lows.appendword(val, width)
+            highs.appendrun('0', (val >> width) - (prev >> width))
+            highs.append('1')
+            prev = val
+
+        self._len = n
+        self._width = width
+        self._lows = lows.freeze(index=False).words
+        self._highs = highs.freeze()
+
+    def _save(self, store, name):
+        """save the sequence to a storage.Store"""
+        store.put(name + '.len', self._len)
+        store.put(name + '.width', self._width)
+        store.put(name + '.lows', self._lows)
+        self._highs._save(store, name + '.highs')  # pylint: disable=W0212
+
+    @classmethod
+    def _load(cls, store, name, vector=bitvector.PackedBitVector):
+        """restore a sequence saved by _save, using the stored arrays
+        in place.
+
+        :param vector: the class of the restored bit vectors
+
+        """
+        ef = cls.__new__(cls)
+        ef._len = store.get(name + '.len')
+        ef._width = store.get(name + '.width')
+        ef._lows = store.get(name + '.lows')
+        ef._highs = vector._load(  # pylint: disable=W0212
+            store, name + '.highs'
+        )
+        return ef
 
     def __nonzero__(self):
         return len(self) > 0
 
     def __len__(self):
-        return len(self.data)
+        return self._len
 
     def __str__(self):
-        return str(list(self))
+        return str(self.decode().tolist())
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+    def _checkstart(self, k):
+        """return the normalized starting index k"""
+        if k < 0:
+            k += len(self)
+        if k < 0 or k > len(self):
+            raise IndexError('index out of range')
+        return k
+
+    def iter_from(self, k):
+        """iterate the values starting at the kth.
+
+        a single select locates the kth value; subsequent values are
+        decoded by walking the high bits a word at a time, in
+        amortized constant time each.
+
+        """
+        k = self._checkstart(k)
+        if k == len(self):
+            return
+        ones = _ones(self._highs.words, self._highs.select('1', k + 1))
+        for k, pos in itertools.izip(xrange(k, len(self)), ones):
+            yield (pos - k) << self._width | self._low(k)
+
+    def decode(self, start=0, stop=None):
+        """return values start ... stop - 1.
+
+        :returns: an array.array of typecode bitvector.WORDTYPE (64-bit
+        words), whatever the backend
+
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        values = array.array(bitvector.WORDTYPE)
+        if start < stop:
+            values.extend(
+                itertools.islice(self.iter_from(start), stop - start)
+            )
+        return values
+
+    def _low(self, idx):
+        """return the low bits of the idx-th value"""
+        return _readbits(self._lows, idx * self._width, self._width)
 
     def __getitem__(self, idx):
         if isinstance(idx, slice):
-            return [self[i] for i in range(*idx.indices(len(self)))]
+            start, stop, stride = idx.indices(len(self))
+            if stride == 1:
+                return self.decode(start, stop).tolist()
+            return [self[i] for i in range(start, stop, stride)]
         if not isinstance(idx, numbers.Integral):
             raise TypeError('indices must be integers')
         if idx < 0:
             idx += len(self)
         if idx < 0 or idx >= len(self):
             raise IndexError('index out of range')
-        return self.data[idx]
+        return self._get(idx)
+
+    def _get(self, idx):
+        """return the idx-th value, which must exist"""
+        high = self._highs.select('1', idx + 1) - idx
+        return high << self._width | self._low(idx)
+
+    def _lowerbound(self, x):
+        """return the index of the first value >= x, or len(self).
+
+        the high bits of x identify its bucket, whose bounds are found
+        with two selects on the zeros of the high bits; the bucket is
+        then binary searched on the low bits alone.
+
+        """
+        if x <= 0 or not self:
+            return 0
+        h, low = x >> self._width, x & ((1 << self._width) - 1)
+        buckets = len(self._highs) - len(self)
+        if h > buckets:
+            return len(self)
+        lo = self._highs.select('0', h) + 1 - h if h else 0
+        hi = (
+            self._highs.select('0', h + 1) - h
+            if h < buckets else
+            len(self)
+        )
+        while lo < hi:
+            mid = (lo + hi) / 2
+            if self._low(mid) < low:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def next_geq(self, x):
+        """return the index of the first value greater than or equal to x"""
+        idx = self._lowerbound(x)
+        if idx == len(self):
+            raise ValueError('no value >= {}'.format(x))
+        return idx
+
+    def prev_leq(self, x):
+        """return the index of the last value less than or equal to x"""
+        idx = self._lowerbound(x + 1) - 1
+        if idx < 0:
+            raise ValueError('no value <= {}'.format(x))
+        return idx
+
+class PartitionedEliasFano(EliasFano):
+    """a non-decreasing sequence of integers in partitioned elias-fano
+    representation.
+
+    the sequence is split into chunks of CHUNK values, and each chunk
+    is encoded relative to the last value of the previous chunk using
+    whichever of three encodings is smallest:
+
+    * RUN: the chunk is a run of consecutive integers, which is fully
+      determined by its last value and takes no space;
+    * BITMAP: a bitmap of the chunk's universe, for dense chunks;
+    * ELIASFANO: low and high bits as in EliasFano, for sparse ones.
+
+    all chunks share one bit vector. the last value of every chunk,
+    and the offset of every chunk in the shared bit vector, are kept
+    in top-level EliasFano sequences. clustered sequences (like the
+    positions of structural characters in json text) take
+    considerably less space than with a single EliasFano, and access
+    remains constant time.
+
+    for more details, see `"partitioned elias-fano indexes"
+    <http://groups.di.unipi.it/~ottavian/files/elias_fano_sigir14.pdf>`_.
+
+    """
+
+    CHUNK = 128
+
+    RUN, BITMAP, ELIASFANO = range(3)
+
+    def __init__(self, data, backend=None):  # pylint: disable=W0231
+        n, _, data = _values(data)
+        payload = backends.get(backend).builder()
+        uppers, offsets, kinds = [], [], array.array('B')
+        base = 0
+        while True:
+            chunk = list(itertools.islice(data, self.CHUNK))
+            if not chunk:
+                break
+            prev = base
+            for val in chunk:
+                assert isinstance(val, numbers.Integral)
+                if val < prev:
+                    raise ValueError('values must be non-negative and sorted')
+                prev = val
+            offsets.append(len(payload))
+            kinds.append(self._encode(payload, chunk, base))
+            uppers.append(chunk[-1])
+            base = chunk[-1]
+
+        self._len = n
+        self._kinds = kinds
+        self._uppers = EliasFano(uppers, backend)
+        self._offsets = EliasFano(offsets, backend)
+        self._payload = payload.freeze()
+
+    def _save(self, store, name):
+        store.put(name + '.len', self._len)
+        store.put(name + '.chunk', self.CHUNK)
+        store.put(name + '.kinds', self._kinds)
+        # pylint: disable=W0212
+        self._uppers._save(store, name + '.uppers')
+        self._offsets._save(store, name + '.offsets')
+        self._payload._save(store, name + '.payload')
+
+    @classmethod
+    def _load(cls, store, name, vector=bitvector.PackedBitVector):
+        if store.get(name + '.chunk') != cls.CHUNK:
+            raise ValueError('index has a different chunk size')
+        # pylint: disable=W0212
+        ef = cls.__new__(cls)
+        ef._len = store.get(name + '.len')
+        ef._kinds = store.get(name + '.kinds')
+        ef._uppers = EliasFano._load(store, name + '.uppers', vector)
+        ef._offsets = EliasFano._load(store, name + '.offsets', vector)
+        ef._payload = vector._load(store, name + '.payload')
+        return ef
+
+    def _encode(self, payload, chunk, base):
+        """append the cheapest encoding of chunk to payload"""
+        m, universe = len(chunk), chunk[-1] - base + 1
+        strict = all(a < b for a, b in zip(chunk, chunk[1:]))
+        if strict and chunk[-1] - chunk[0] == m - 1:
+            return self.RUN
+
+        width = _width(m, universe)
+        if strict and universe <= m * (width + 2):
+            prev = -1
+            for val in chunk:
+                payload.appendrun('0', val - base - prev - 1)
+                payload.append('1')
+                prev = val - base
+            return self.BITMAP
+
+        for val in chunk:
+            payload.appendword(val - base, width)
+        prev = 0
+        for val in chunk:
+            payload.appendrun('0', ((val - base) >> width) - (prev >> width))
+            payload.append('1')
+            prev = val - base
+        return self.ELIASFANO
+
+    def _chunk(self, c):
+        """return the size, base, last value, kind and offset of chunk c"""
+        m = min(self.CHUNK, len(self) - c * self.CHUNK)
+        base = self._uppers[c - 1] if c else 0
+        return m, base, self._uppers[c], self._kinds[c], self._offsets[c]
+
+    def _ranked(self, offset, k):
+        """return the position of the kth one in the payload after offset"""
+        before = self._payload.rank('1', offset - 1) if offset else 0
+        return self._payload.select('1', before + k)
+
+    def _get(self, idx):
+        c, j = divmod(idx, self.CHUNK)
+        m, base, upper, kind, offset = self._chunk(c)
+        if kind == self.RUN:
+            return upper - (m - 1 - j)
+        if kind == self.BITMAP:
+            return base + self._ranked(offset, j + 1) - offset
+        width = _width(m, upper - base + 1)
+        highs = offset + m * width
+        high = self._ranked(highs, j + 1) - highs - j
+        low = _readbits(self._payload.words, offset + j * width, width)
+        return base + (high << width | low)
+
+    def _lowerbound(self, x):
+        if x <= 0 or not self:
+            return 0
+        if x > self._uppers[-1]:
+            return len(self)
+        c = self._uppers.next_geq(x)
+        m, base, upper, kind, offset = self._chunk(c)
+        if kind == self.RUN:
+            return c * self.CHUNK + max(0, x - (upper - m + 1))
+        if kind == self.BITMAP:
+            if x <= base:
+                return c * self.CHUNK
+            pos = offset + x - base - 1
+            return c * self.CHUNK + (
+                self._payload.rank('1', pos) -
+                (self._payload.rank('1', offset - 1) if offset else 0)
+            )
+        lo, hi = c * self.CHUNK, c * self.CHUNK + m - 1
+        while lo < hi:
+            mid = (lo + hi) / 2
+            if self._get(mid) < x:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def iter_from(self, k):
+        k = self._checkstart(k)
+        if k == len(self):
+            return
+        words = self._payload.words
+        for c in xrange(k / self.CHUNK, len(self._kinds)):
+            m, base, upper, kind, offset = self._chunk(c)
+            j = k - c * self.CHUNK if c == k / self.CHUNK else 0
+            if kind == self.RUN:
+                for val in xrange(upper - m + 1 + j, upper + 1):
+                    yield val
+            elif kind == self.BITMAP:
+                ones = _ones(words, self._ranked(offset, j + 1))
+                for _, pos in itertools.izip(xrange(j, m), ones):
+                    yield base + pos - offset
+            else:
+                width = _width(m, upper - base + 1)
+                highs = offset + m * width
+                ones = _ones(words, self._ranked(highs, j + 1))
+                for j, pos in itertools.izip(xrange(j, m), ones):
+                    low = _readbits(words, offset + j * width, width)
+                    yield base + ((pos - highs - j) << width | low)
@@ -13,6 +13,8 @@ space" <http://www.di.unipi.it/~ottavian/files/semi_index_cikm.pdf>`_.
 from __future__ import absolute_import
 
 import sys
+import mmap
+import zlib
 import numbers
 import itertools
 import collections
@@ -22,9 +24,64 @@ import lark
 
 from succinct import (
     tree,
+    storage,
+    backends,
     encoding,
 )
 
+def _source(src):
+    """return json text as a string, or a zero-copy buffer of its bytes.
+
+    :param src: the json text, or an object holding its bytes (e.g.,
+    an mmap.mmap, memoryview or bytearray); memoryviews can only be
+    wrapped by numpy, and are copied to a string without it
+
+    """
+    if isinstance(src, (basestring, buffer)):
+        return src
+    if isinstance(src, memoryview):
+        # python 2 buffers cannot wrap memoryviews, but numpy can
+        try:
+            import numpy
+        except ImportError:
+            return src.tobytes()
+        return numpy.asarray(src).data
+    return buffer(src)
+
+def _fingerprint(src, samples=64, size=1 << 10):
+    """return a checksum of evenly spaced windows of json text.
+
+    only a bounded sample of the text is read, so a saved index can be
+    matched against a large source without reading all of it.
+
+    :param int samples: the (minimum) number of windows
+    :param int size: the number of characters per window
+
+    """
+    crc, step = 0, max(size, -(-len(src) // samples))
+    for start in xrange(0, len(src), step):
+        window = _text(src[start:start + size])
+        if isinstance(window, unicode):
+            window = window.encode('utf-8')
+        crc = zlib.crc32(window, crc)
+    return crc & 0xffffffff
+
+def _text(view):
+    """return the text of a string or buffer"""
+    return view if isinstance(view, basestring) else str(view)
+
+def _unescape(body):
+    """return the contents of a json string given its (quoteless) body.
+
+    the result has the type of the body, so strings in utf-8 text stay
+    utf-8 bytes; bodies without escapes are returned as is.
+
+    """
+    if '\\' not in body:
+        return body
+    value = pyjson.loads('"' + body + '"')
+    return value if isinstance(body, unicode) else value.encode('utf-8')
+
 class Index(collections.Sequence):
     """a read-only mapping from json nodes to their original positions.
 
@@ -37,7 +94,7 @@ class Index(collections.Sequence):
     def __init__(self, src, enc):  # pylint: disable=W0231
         """instantiate a json semi-index.
 
-        :param str src: the original json text
+        :param src: the original json text, as a string or buffer
         :param encoding.EliasFano enc: a sequence giving the position
         of json nodes in the original text
 
@@ -57,7 +114,8 @@ class Index(collections.Sequence):
 
         :param idx: the succint tree node index
         :type idx: ``int`` or ``slice``
-        :returns: the json text
+        :returns: the json text (a zero-copy buffer if the source is
+        not a string)
 
         """
         if not isinstance(idx, (slice, numbers.Integral)):
@@ -78,6 +136,9 @@ class Index(collections.Sequence):
                 else:
                     e = self.lookup(e)
             idx = slice(s, e)
+            if not isinstance(self.src, basestring):
+                s, e, _ = idx.indices(len(self.src))
+                return buffer(self.src, s, max(0, e - s))
         else:
             idx = self.lookup(idx)
         return self.src[idx]
@@ -98,12 +159,92 @@ class Document(object):
     deserialized on access. this can save time when you only need to
     access a few nodes in very large documents.
 
+    key lookups in an object build a hash index of its keys in one
+    pass over its children. the indexes of recently used objects are
+    kept, up to a total of KEYS keys; objects with more keys than that
+    are not indexed, and are searched by walking their children.
+
     """
 
-    def __init__(self, src):
-        self._src = src
+    KEYS = 1 << 16  # keys in the cached object key indexes
+
+    def __init__(self, src, backend=None, processes=None):
+        """instantiate a document.
+
+        :param src: the json text, or an object holding its bytes
+        (e.g., an mmap.mmap, memoryview or bytearray), which is used
+        in place (memoryviews are copied if numpy is not installed)
+        :param backend: the backend (or its name) used to build the
+        tree and index; see backends.get
+        :param processes: if given, the number of worker processes
+        used to scan large documents in parallel
+
+        """
+        self._src = _source(src)
+        self._backend = backends.get(backend)
+        self._processes = processes
         self._nav = None
         self._idx = None
+        self._keys = collections.OrderedDict()
+        self._nkeys = 0
+
+    @classmethod
+    def open(cls, src_path, index_path=None, backend=None, processes=None):
+        """open a json file.
+
+        the file is memory-mapped, so only the pages holding the
+        rendered nodes are read once the document is indexed. if an
+        index saved by save_index is given, it is also memory-mapped
+        and used in place, without being rebuilt or validated; only
+        its length and a checksum of a sample of the text are compared
+        with the source, so some edits may go undetected.
+
+        :param str src_path: the path of the json text
+        :param str index_path: the path of a saved index
+        :param backend: the backend (or its name); defaults to the
+        backend that built the index
+        :param processes: the number of worker processes used to scan
+        the file, if it is not indexed (see Document)
+        :raises ValueError: if the index is invalid, or was saved for
+        a different text
+
+        """
+        with open(src_path, 'rb') as fp:
+            src = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if index_path is None:
+            return cls(src, backend, processes)
+
+        store = storage.load(index_path)
+        if (len(src) != store.get('source.len') or
+                'source.crc' not in store or
+                _fingerprint(src) != store.get('source.crc')):
+            raise ValueError('index does not match the source')
+
+        be = backends.get(backend or store.get('backend'))
+        doc = cls(src, be)
+        # pylint: disable=W0212
+        doc._nav = tree.Navigator(
+            be.parentheses._load(store, 'tree', be.bitvector)
+        )
+        doc._idx = Index(
+            doc._src, be.eliasfano._load(store, 'index', be.bitvector)
+        )
+        return doc
+
+    def save_index(self, path):
+        """save the tree and index of the document (see open).
+
+        :param str path: the path of the index file
+
+        """
+        store = storage.Store()
+        store.put('backend', self._backend.name)
+        store.put('source.len', len(self._src))
+        store.put('source.crc', _fingerprint(self._src))
+        # pylint: disable=W0212
+        self.nav.enc._save(store, 'tree')
+        self.idx.enc._save(store, 'index')
+        storage.save(path, store)
 
     @property
     def nav(self):
@@ -119,6 +260,19 @@ class Document(object):
             self._loads()
         return self._idx
 
+    def native(self, text):
+        """return text as a string of the same type as the source.
+
+        documents over bytes (including buffers and memory-mapped
+        files) are processed as utf-8 without being decoded, so text
+        is encoded to match them; documents over unicode text are
+        processed as text.
+
+        """
+        if isinstance(self._src, unicode):
+            return text if isinstance(text, unicode) else text.decode('utf-8')
+        return text.encode('utf-8') if isinstance(text, unicode) else text
+
     def root(self):
         """return the root node of the document"""
         return self.render(self.nav.root())
@@ -136,6 +290,10 @@ class Document(object):
         while idx < len(self._src) and self._src[idx].isspace():
             idx += 1
         c = self._src[idx]
+        if node.pos % 2 and c in ('[', '{'):
+            # odd indices are commas -- skip them, without moving the
+            # caller's node
+            node = node.__class__(node.nav, node.pos + 1)
         return (
             List(self, node)
             if c == '[' else
@@ -144,43 +302,64 @@ class Document(object):
             Primitive(self, node)
         )
 
-    def _loads(self):
-        """construct the succinct tree and index"""
-        from test.bitvector import BitVector
-        from test.encoding import BalancedParentheses
-
-        seq = iter(self._src)
-        bv, pos = BitVector(''), BitVector('')
-        while True:
-            c = next(seq, None)
-            if c is None:
+    def _key(self, pos):
+        """return the (unescaped) key at tree position pos"""
+        return _unescape(_text(
+            self.idx[pos:self.nav.enc.close(pos)]
+        ).strip()[1:-1])
+
+    def _members(self, pos):
+        """iterate the tree positions of the keys and values of the
+        object at tree position pos"""
+        enc = self.nav.enc
+        key, end = pos + 1, enc.close(pos)
+        while key < end:
+            val = enc.close(key) + 1
+            if val >= end:
                 break
-            if c in '[{':
-                pos.append('1')
-                bv.extend('11')
-            elif c in '}]':
-                pos.append('1')
-                bv.extend('00')
-            elif c in ':,':
-                pos.append('1')
-                bv.extend('01')
-            elif c == '"':
-                escaped = True
-                while escaped or c != '"':
-                    pos.append('0')
-                    c = next(seq, None)
-                    if c is None:
-                        raise ValueError('malformed json')
-                    escaped = c == '\\'
-                pos.append('0')
-            else:
-                pos.append('0')
-
-        if bv and (len(bv) < 2 or bv[-2:] != '00'):
-            raise ValueError('malformed json')
+            yield key, val
+            key = enc.close(val) + 1
+
+    def _keyindex(self, pos):
+        """return a map from keys to value positions for the object at
+        tree position pos, or None if it has more than KEYS keys"""
+        if pos in self._keys:
+            keys = self._keys.pop(pos)
+        else:
+            keys = {}
+            for key, val in self._members(pos):
+                # the first of duplicate keys wins
+                keys.setdefault(self._key(key), val)
+                if len(keys) > self.KEYS:
+                    # remembered, at a nominal cost, so the object is
+                    # not scanned again
+                    keys = None
+                    break
+            self._nkeys += 1 if keys is None else len(keys)
+            while self._keys and self._nkeys > self.KEYS:
+                evicted = self._keys.popitem(last=False)[1]
+                self._nkeys -= 1 if evicted is None else len(evicted)
+        self._keys[pos] = keys
+        return keys
+
+    def _lookup(self, pos, item):
+        """return the tree position of the value of key item in the
+        object at tree position pos, or None"""
+        keys = self._keyindex(pos)
+        if keys is not None:
+            return keys.get(item)
+        for key, val in self._members(pos):
+            if self._key(key) == item:
+                return val
+        return None
 
-        self._nav = tree.Navigator(BalancedParentheses(bv))
-        self._idx = Index(self._src, encoding.EliasFano(pos))
+    def _loads(self):
+        """construct the succinct tree and index"""
+        be = self._backend
+        bv, pos = be.scanner(self._src, processes=self._processes)
+        # the scanner checked the nesting, so the encoding is trusted
+        self._nav = tree.Navigator(be.parentheses(bv, trusted=True))
+        self._idx = Index(self._src, be.eliasfano(pos, be))
 
 class Null(object):
     """null json node"""
@@ -188,6 +367,10 @@ class Null(object):
     def __str__(self):
         return 'null'
 
+    def value(self):
+        """return None"""
+        return None
+
     __repr__ = __str__
 
 class Node(collections.Sized):
@@ -204,12 +387,16 @@ class Node(collections.Sized):
         return self.node.degree()
 
     def __str__(self):
-        return self.doc.idx[
+        return _text(self.doc.idx[
             self.node.pos:self.doc.nav.enc.close(self.node.pos)
-        ].strip()
+        ]).strip()
 
     __repr__ = __str__
 
+    def value(self):
+        """return the node as python objects, decoding its text"""
+        return pyjson.loads(self.__str__())
+
 class Primitive(Node):
     """json primitive node (i.e., string, number, or boolean)"""
 
@@ -218,17 +405,25 @@ class Primitive(Node):
 class Container(Node):
     """json container node"""
 
-    def __init__(self, doc, node):
-        # odd indices are commas -- skip them
-        node.pos += node.pos % 2
-        super(Container, self).__init__(doc, node)
+    pass
 
 class List(collections.Sequence, Container):
     """json list node"""
 
+    def __iter__(self):
+        for node in self.node.children():
+            yield self.doc.render(node)
+
     def __getitem__(self, item):
         if isinstance(item, slice):
-            return [self[i] for i in range(*item.indices(len(self)))]
+            start, stop, step = item.indices(len(self))
+            if step < 0:
+                return list(self)[item]
+            return [
+                self.doc.render(node) for node in itertools.islice(
+                    self.node.children(start), 0, max(0, stop - start), step
+                )
+            ]
         if not isinstance(item, numbers.Integral):
             raise TypeError(
                 'list indices must be integers, not {}'.format(
@@ -251,9 +446,7 @@ class Object(collections.Mapping, Container):
             yield key, next(itr)
 
     def _key(self, node):
-        return self.doc.idx[
-            node.pos:self.doc.nav.enc.close(node.pos)
-        ].strip()[1:-1]
+        return self.doc._key(node.pos)  # pylint: disable=W0212
 
     def _val(self, node):
         return self.doc.render(node)
@@ -265,20 +458,25 @@ class Object(collections.Mapping, Container):
     def __getitem__(self, item):
         if not isinstance(item, basestring):
             raise TypeError('key must be a string')
-        for key, val in self._items():
-            if self._key(key) == item:
-                return self._val(val)
-        raise KeyError(item)
+        pos = self.doc._lookup(  # pylint: disable=W0212
+            self.node.pos, self.doc.native(item)
+        )
+        if pos is None:
+            raise KeyError(item)
+        return self._val(self.doc.nav.node(pos))
 
-def loads(src):
+def loads(src, backend=None, processes=None):
     """deserialize a string to a succint json document.
 
     :param str src: the json text
+    :param backend: the backend (or its name); see backends.get
+    :param processes: the number of worker processes used to scan
+    large documents (see Document)
     :returns: the json document root
     :rtype: Node
 
     """
-    return Document(src).root()
+    return Document(src, backend, processes).root()
 
 class Query(object):
     """query engine for succinct json documents.
@@ -438,7 +636,7 @@ class Query(object):
                 elif expression.data == 'cname':
                     return expression.children
                 elif expression.data == 'string':
-                    return [expression.children[0][1:-1]]
+                    return [_unescape(expression.children[0][1:-1])]
                 elif expression.data in ('integer', 'float'):
                     return [mkint(expression)]
                 else:
@@ -448,14 +646,14 @@ class Query(object):
                 for node in stream:
                     if isinstance(node, Object):
                         if isinstance(item, Primitive):
-                            item = str(item)[1:-1]
+                            item = item.value()
                         if isinstance(item, basestring):
                             yield node.get(item, null)
                             continue
 
                     if isinstance(node, List):
                         if isinstance(item, Primitive):
-                            item = int(str(item))
+                            item = item.value()
                         if isinstance(item, (int, slice)):
                             try:
                                 yield node[item]
@@ -497,7 +695,7 @@ class Query(object):
             elif expression.data == 'boolean':
                 return expression.children[0] == 'true'
             elif expression.data == 'string':
-                return expression.children[0][1:-1]
+                return _unescape(expression.children[0][1:-1])
             elif expression.data == 'integer':
                 return int(expression.children[0])
             elif expression.data == 'float':
@@ -544,7 +742,7 @@ class Query(object):
         for result in stream:
             yield result
 
-def query(src, jq):
+def query(src, jq, backend=None):
     """render python objects from json text.
 
     >>> query('{"foo": [0, 1, 2], "bar": [3, 4, 5]}', '.bar | .[:-1]')
@@ -554,14 +752,15 @@ def query(src, jq):
 
     :param str src: the json text
     :param str jq: a jq query describing the objects to render
+    :param backend: the backend (or its name); see backends.get
     :returns: a sequence of python objects
 
     """
-    for res in Query(jq).execute(loads(src)):
+    for res in Query(jq).execute(loads(src, backend)):
         if isinstance(res, (Null, Node)):
-            yield pyjson.loads(str(res))
+            yield res.value()
         else:
-            yield [pyjson.loads(str(item)) for item in res]
+            yield [item.value() for item in res]
 
 def main():
     import argparse
@@ -617,21 +816,41 @@ def main():
         'query',
         help='jq query',
     )
+    p.add_argument(
+        '--backend',
+        choices=backends.available(),
+        help='succinct data structure implementation (defaults to '
+        '${} or the fastest available)'.format(backends.ENVIRONMENT),
+    )
+    p.add_argument(
+        '-j', '--processes',
+        type=int,
+        help='scan large files in parallel with this many processes',
+    )
     p.add_argument(
         'files',
         nargs='*',
-        type=argparse.FileType('r'),
         help='files to query (defaults to stdin)',
     )
 
     def dumps(node):
-        return pyjson.dumps(pyjson.loads(str(node)), indent=2)
+        return pyjson.dumps(node.value(), indent=2)
 
     args = p.parse_args()
 
+    def documents():
+        for path in args.files or ['-']:
+            if path == '-':
+                yield Document(sys.stdin.read(), args.backend, args.processes)
+            else:
+                # map files rather than reading them into memory
+                yield Document.open(
+                    path, backend=args.backend, processes=args.processes
+                )
+
     jq = Query(args.query)
-    for fp in args.files or [sys.stdin]:
-        for res in jq.execute(loads(fp.read())):
+    for doc in documents():
+        for res in jq.execute(doc.root()):
             if isinstance(res, (Null, Node)):
                 print dumps(res)
             else:
@@ -0,0 +1,213 @@
+"""structural scanning of json text.
+
+the scanner finds the structural characters of a json document, i.e.,
+the brackets, braces, colons, and commas outside of strings, and
+encodes them as the two bit vectors of a json semi-index:
+
+* the balanced parentheses encoding of the document tree, in which
+  each opening character contributes `11`, each closing character
+  `00`, and each colon or comma `01` (closing one element and
+  opening the next)
+* a bit vector with a set bit at the position of each structural
+  character in the text
+
+large documents can be scanned in parallel: the text is split into
+chunks, and each chunk is summarized by a worker process twice,
+speculatively starting outside and inside a string. the summaries are
+then stitched together in order, picking the speculation matching the
+state at the end of the previous chunk.
+
+this module provides the pure python scanner; the numpy backend
+provides a vectorized scanner with the same interface (see
+vectorized.scan).
+
+"""
+
+import re
+import sys
+import collections
+import multiprocessing
+
+from succinct import bitvector
+
+OPENING = '[{'
+CLOSING = ']}'
+SEPARATORS = ':,'
+
+# a structural character, or a string (whose closing quote is captured
+# so that unterminated strings can be detected)
+TOKENS = re.compile(r'[\[\]{}:,]|"[^"\\]*(?:\\.[^"\\]*)*("?)', re.DOTALL)
+
+# the remainder of a string
+TAIL = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*("?)', re.DOTALL)
+
+CHUNKSIZE = 1 << 24  # characters per parallel scanning task
+
+class Chunk(collections.namedtuple(
+        'Chunk', ['bits', 'positions', 'depth', 'lowest', 'separator']
+)):
+    """the summary of a scanned chunk of json text.
+
+    :param bits: the balanced parentheses bits of the chunk
+    :param positions: the structural positions in the chunk, as a bit
+    vector with a bit per character
+    :param depth: the change in nesting depth over the chunk
+    :param lowest: the lowest depth reached, relative to its start
+    :param separator: the lowest relative depth of a colon or comma
+    (sys.maxint if there are none)
+
+    """
+    __slots__ = ()
+
+def check(depth, structural):
+    """raise ValueError unless a scan is well-formed.
+
+    :param int depth: the nesting depth at the end of the text
+    :param int structural: the number of structural characters
+
+    """
+    if depth or not structural:
+        raise ValueError('malformed json')
+
+def summarize(src, instring=False, escaped=False,
+              builder=bitvector.BitVectorBuilder):
+    """scan a chunk of json text.
+
+    :param src: the chunk
+    :param bool instring: whether the chunk starts inside a string
+    :param bool escaped: whether its first character is escaped
+    :param builder: the class of bit vector builder to use
+    :returns: the Chunk, and whether the text following it starts
+    inside a string
+
+    """
+    bv, pos = builder(), builder()
+    depth = lowest = end = 0
+    separator = sys.maxint
+    if instring:
+        tail = TAIL.match(src, 1 if escaped and src else 0)
+        if not tail.group(1):
+            pos.appendrun('0', len(src))
+            return Chunk(bv.freeze(False), pos.freeze(False), 0, 0,
+                         separator), True
+        end = tail.end()
+        pos.appendrun('0', end)
+        instring = False
+    # note that words are appended least significant bit first
+    for match in TOKENS.finditer(src, end):
+        start = match.start()
+        c = src[start]
+        if c == '"':
+            if not match.group(1):
+                instring = True
+            continue
+        if c in OPENING:
+            bv.appendword(0b11, 2)
+            depth += 1
+        elif c in CLOSING:
+            bv.appendword(0b00, 2)
+            depth -= 1
+            lowest = min(lowest, depth)
+        else:
+            bv.appendword(0b10, 2)
+            separator = min(separator, depth)
+        pos.appendrun('0', start - end)
+        pos.append('1')
+        end = start + 1
+    pos.appendrun('0', len(src) - end)
+
+    chunk = Chunk(bv.freeze(False), pos.freeze(False), depth, lowest,
+                  separator)
+    return chunk, instring
+
+def join(chunks, builder=bitvector.BitVectorBuilder):
+    """stitch scanned chunks together.
+
+    :param chunks: an iterable of Chunks, in order
+    :param builder: the class of bit vector builder to use
+    :returns: the balanced parentheses bits and structural positions,
+    as bit vectors
+    :raises ValueError: if the chunks are not properly nested
+
+    """
+    bv, pos, depth = builder(), builder(), 0
+    for chunk in chunks:
+        if depth + chunk.lowest < 0 or depth + chunk.separator < 1:
+            raise ValueError('malformed json')
+        depth += chunk.depth
+        bv.appendwords(chunk.bits.words, len(chunk.bits))
+        pos.appendwords(chunk.positions.words, len(chunk.positions))
+    check(depth, len(bv))
+    return bv.freeze(), pos.freeze(index=False)
+
+def _escaped(src, start):
+    """return whether src[start] follows an odd number of backslashes"""
+    idx = start
+    while idx > 0 and src[idx - 1] == '\\':
+        idx -= 1
+    return (start - idx) % 2 == 1
+
+def _speculate(task):
+    """summarize a chunk starting both outside and inside a string"""
+    summary, src, escaped = task
+    return summary(src, False, escaped), summary(src, True, escaped)
+
+def parallel(src, summary=summarize, builder=bitvector.BitVectorBuilder,
+             processes=None, chunksize=CHUNKSIZE):
+    """scan json text in parallel.
+
+    :param src: the json text
+    :param summary: the function summarizing each chunk (see
+    summarize); it must be picklable
+    :param builder: the class of bit vector builder to use
+    :param processes: the number of worker processes (defaults to the
+    number of cpus)
+    :param int chunksize: the number of characters per chunk
+    :returns: the balanced parentheses bits and structural positions,
+    as bit vectors
+    :raises ValueError: if the text is not properly nested, or has an
+    unterminated string
+
+    """
+    # word-aligned chunks let the positions be stitched by copying
+    chunksize = max(64, chunksize - chunksize % 64)
+    tasks = (
+        (summary, src[start:start + chunksize], _escaped(src, start))
+        for start in xrange(0, len(src), chunksize)
+    )
+    state = {'instring': False}
+
+    def chunks(results):
+        for result in results:
+            chunk, state['instring'] = result[state['instring']]
+            yield chunk
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        bv, pos = join(chunks(pool.imap(_speculate, tasks)), builder)
+    finally:
+        pool.terminate()
+        pool.join()
+    if state['instring']:
+        raise ValueError('malformed json')
+    return bv, pos
+
+def scan(src, builder=bitvector.BitVectorBuilder, processes=None):
+    """scan json text.
+
+    :param src: the json text
+    :param builder: the class of bit vector builder to use
+    :param processes: if given, the number of worker processes used
+    to scan the text in parallel (see parallel)
+    :returns: the balanced parentheses bits and structural positions,
+    as bit vectors
+    :raises ValueError: if the text is not properly nested, or has an
+    unterminated string
+
+    """
+    if processes is not None and len(src) > CHUNKSIZE:
+        return parallel(src, summarize, builder, processes)
+    chunk, instring = summarize(src, builder=builder)
+    if instring:
+        raise ValueError('malformed json')
+    return join([chunk], builder)
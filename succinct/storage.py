@@ -0,0 +1,145 @@
+"""persistent, memory-mapped storage of succinct data structures.
+
+a stored file begins with a magic string, a format version and the
+length of a json header, followed by the header itself. the header
+records the scalar fields of the stored structures and, for each of
+their arrays, its typecode, length and byte offset. the arrays follow
+the header, each aligned to 8 bytes, in the byte order of the machine
+that wrote them.
+
+loaded arrays are ctypes views of a private (copy-on-write) memory
+map of the file: nothing is copied or validated, and the pages are
+shared by every process mapping the same file.
+
+"""
+
+from __future__ import absolute_import
+
+import sys
+import mmap
+import array
+import ctypes
+import struct
+import json as pyjson
+
+MAGIC = 'SUCCINCT'
+VERSION = 1
+PREAMBLE = struct.Struct('<8sII')  # magic, version, header length
+ALIGN = 8
+
+# the C type of each integer array typecode ('q' and 'Q' are not
+# array.array typecodes in python 2, but are numpy dtype characters)
+CTYPES = {
+    'b': ctypes.c_byte, 'B': ctypes.c_ubyte,
+    'h': ctypes.c_short, 'H': ctypes.c_ushort,
+    'i': ctypes.c_int, 'I': ctypes.c_uint,
+    'l': ctypes.c_long, 'L': ctypes.c_ulong,
+    'q': ctypes.c_longlong, 'Q': ctypes.c_ulonglong,
+}
+
+def _ctype(typecode):
+    """return the fixed-size ctypes type of the array typecode"""
+    size = ctypes.sizeof(CTYPES[typecode]) * 8
+    if typecode.isupper():
+        return getattr(ctypes, 'c_uint{}'.format(size))
+    return getattr(ctypes, 'c_int{}'.format(size))
+
+def _typecode(values):
+    """return the array typecode of a sequence of values"""
+    if isinstance(values, array.array):
+        return values.typecode
+    if isinstance(values, ctypes.Array):
+        ctype = values._type_  # pylint: disable=W0212
+        size, signed = ctypes.sizeof(ctype), ctype(-1).value < 0
+        for typecode in ('bhilq' if signed else 'BHILQ'):
+            if ctypes.sizeof(CTYPES[typecode]) == size:
+                return typecode
+        return 'q' if signed else 'Q'
+    if hasattr(values, 'dtype'):
+        return values.dtype.char
+    raise TypeError('cannot store {}'.format(type(values).__name__))
+
+def _aligned(n):
+    return -(-n // ALIGN) * ALIGN
+
+class Store(object):
+    """a collection of named scalars and arrays.
+
+    structures save themselves to a store with put(), under names
+    prefixed by their own name, and are restored from a loaded store
+    with get().
+
+    """
+
+    def __init__(self, meta=None, arrays=None):
+        self.meta = {} if meta is None else meta
+        self.arrays = {} if arrays is None else arrays
+
+    def __contains__(self, name):
+        return name in self.meta or name in self.arrays
+
+    def put(self, name, value):
+        """store a scalar (or list of scalars) or an array"""
+        if value is None or isinstance(value, (int, long, basestring, list)):
+            self.meta[name] = value
+        else:
+            self.arrays[name] = value
+
+    def get(self, name):
+        """return a stored scalar or array"""
+        if name in self.meta:
+            return self.meta[name]
+        if name in self.arrays:
+            return self.arrays[name]
+        raise KeyError(name)
+
+def save(path, store):
+    """write a store to a file"""
+    layout, offset = {}, 0
+    for name in sorted(store.arrays):
+        values = store.arrays[name]
+        typecode = _typecode(values)
+        layout[name] = [typecode, len(values), offset]
+        offset = _aligned(
+            offset + len(values) * ctypes.sizeof(_ctype(typecode))
+        )
+    header = pyjson.dumps({
+        'byteorder': sys.byteorder,
+        'meta': store.meta,
+        'arrays': layout,
+    })
+    start = _aligned(PREAMBLE.size + len(header))
+
+    with open(path, 'wb') as fp:
+        fp.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        fp.write(header)
+        for name in sorted(store.arrays):
+            fp.write('\0' * (start + layout[name][2] - fp.tell()))
+            fp.write(buffer(store.arrays[name]))
+
+def load(path):
+    """map a file written by save, and return its store.
+
+    :raises ValueError: if the file is not a store, or was written by
+    an incompatible version or machine
+
+    """
+    with open(path, 'rb') as fp:
+        buf = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_COPY)
+    if len(buf) < PREAMBLE.size:
+        raise ValueError('not a succinct index')
+    magic, version, size = PREAMBLE.unpack_from(buf)
+    if magic != MAGIC:
+        raise ValueError('not a succinct index')
+    if version != VERSION:
+        raise ValueError('unsupported index version {}'.format(version))
+    header = pyjson.loads(buf[PREAMBLE.size:PREAMBLE.size + size])
+    if header['byteorder'] != sys.byteorder:
+        raise ValueError('index has a different byte order')
+
+    start, arrays = _aligned(PREAMBLE.size + size), {}
+    for name, (typecode, n, offset) in header['arrays'].items():
+        arrays[name] = (_ctype(str(typecode)) * n).from_buffer(
+            buf, start + offset
+        )
+    return Store(header['meta'], arrays)
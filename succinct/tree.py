@@ -1,18 +1,35 @@
+import array
 import numbers
+import itertools
 import collections
 
-from succinct import encoding
+from succinct import (
+    backends,
+    bitvector,
+    encoding,
+)
 
 class Node(object):
-    """models a tree node"""
+    """models a tree node.
+
+    nodes are lightweight handles on a position of the navigator's
+    encoding: they are not checked on construction (see
+    Navigator.node), and are created anew by each navigation.
+
+    """
+    __slots__ = ('nav', 'pos', '_child')
+
+    WALK = 16  # maximum siblings walked from the last child returned
 
     def __init__(self, nav, pos):
         assert isinstance(nav, Navigator)
-        if nav.enc[pos] != '(':
-            raise ValueError('no node at position {}'.format(pos))
         self.nav = nav
         self.pos = pos
 
+    def _at(self, pos):
+        """return the node at position pos, if any"""
+        return None if pos is None else self.__class__(self.nav, pos)
+
     def __str__(self):
         return 'Node(pos={})'.format(self.pos)
 
@@ -40,9 +57,7 @@ class Node(object):
 
     def parent(self):
         """return this node's parent"""
-        if self.pos == 0:
-            return None
-        return self.nav.node(self.nav.enc.enclose(self.pos))
+        return self._at(self.nav.parentpos(self.pos))
 
     def degree(self):
         """return the number of children of this node"""
@@ -65,47 +80,61 @@ class Node(object):
         )
 
     def child(self, k):
-        """return this node's kth child"""
-        if k < 0 or k >= self.degree():
+        """return this node's kth child.
+
+        the position of the last child returned is remembered, so that
+        children following it are found by walking their siblings.
+
+        """
+        if k < 0:
             raise IndexError('index out of range')
-        if k == 0:
-            return self.nav.node(self.pos + 1)
-        return self.nav.node(
-            1 + self.nav.enc.selectmin(
+        last, pos = getattr(self, '_child', (0, self.pos + 1))
+        if not 0 <= k - last <= self.WALK:
+            if k >= self.degree():
+                raise IndexError('index out of range')
+            last, pos = k, 1 + self.nav.enc.selectmin(
                 self.pos + 1,
                 self.nav.enc.close(self.pos) - 1,
                 k
-            )
-        )
+            ) if k else self.pos + 1
+        while last < k and self.nav.enc[pos] == '(':
+            pos, last = self.nav.enc.close(pos) + 1, last + 1
+        if self.nav.enc[pos] == ')':
+            raise IndexError('index out of range')
+        self._child = k, pos
+        return self._at(pos)
 
-    def children(self):
-        """iterate the children of this node"""
-        for k in xrange(self.degree()):
-            yield self.child(k)
+    def children(self, start=0):
+        """iterate the children of this node, from the start-th"""
+        try:
+            pos = self.child(start).pos if start else self.pos + 1
+        except IndexError:
+            return
+        enc = self.nav.enc
+        while enc[pos] == '(':
+            yield self._at(pos)
+            pos = enc.close(pos) + 1
 
     def nextsibling(self):
         """return this node's next sibling"""
-        if not self.pos:
-            return None
-        pos = self.nav.enc.close(self.pos) + 1
-        if self.nav.enc[pos] == ')':
-            return None
-        return self.nav.node(pos)
+        return self._at(self.nav.nextsiblingpos(self.pos))
 
     def prevsibling(self):
         """return this node's previous sibling"""
-        if not self.pos:
-            return None
-        if self.nav.enc[self.pos - 1] != ')':
-            return None
-        return self.nav.node(self.nav.enc.open(self.pos - 1))
+        return self._at(self.nav.prevsiblingpos(self.pos))
 
     def ancestor(self, d):
         """return the ancestor of this node d levels up"""
         if d < 0 or d >= self.depth():
             return None
+        if self.nav.ancestors is not None:
+            return self._at(self.nav.ancestors.ancestor(self.pos, d))
         return self.nav.node(self.nav.enc.bwdsearch(self.pos, -d - 1) + 1)
 
+    def path(self):
+        """return the nodes from the root down to this node"""
+        return [self._at(pos) for pos in self.nav.rootpath(self.pos)][::-1]
+
     def lca(self, n):
         """return the lowest common ancestor of this node and node n"""
         assert isinstance(n, Node)
@@ -122,6 +151,8 @@ class Node(object):
 
     def levelnext(self):
         """return the next node with the same depth as this one"""
+        if self.nav.levels is not None:
+            return self._at(self.nav.levels.next(self.pos, self.depth()))
         try:
             return self.nav.node(
                 self.nav.enc.fwdsearch(
@@ -133,6 +164,8 @@ class Node(object):
 
     def levelprev(self):
         """return the previous node with the same depth as this one"""
+        if self.nav.levels is not None:
+            return self._at(self.nav.levels.prev(self.pos, self.depth()))
         try:
             return self.nav.node(
                 self.nav.enc.open(
@@ -199,8 +232,7 @@ class Navigator(collections.Sequence):
     this class captures the structure of static trees. a tree's
     structure comprises the child, parent, and sibling relationships
     of its nodes but does *not* represent satellite data associated
-    with said nodes; for this functionality, see the Tree or
-    SearchTree classes.
+    with said nodes; for this functionality, see the Tree class.
 
     the tree is indexed by preorder node rank. in other words, node 0
     corresponds to the first node in the preorder enumeration of the
@@ -209,10 +241,30 @@ class Navigator(collections.Sequence):
     """
     # pylint: disable=W0231
 
-    def __init__(self, enc, nodecls=Node):
-        assert isinstance(enc, encoding.BalancedParentheses)
+    SCAN = 1 << 12  # bits read at a time by traversals
+
+    def __init__(self, enc, nodecls=Node, backend=None):
+        """instantiate a navigator.
+
+        :param enc: the balanced parentheses encoding of the tree, or
+        a bit vector or string of bits or parentheses to encode using
+        the backend
+        :param nodecls: the class of the nodes returned
+        :param backend: the backend (or its name) used to encode enc;
+        see backends.get
+
+        """
+        if not isinstance(enc, encoding.BalancedParentheses):
+            be = backends.get(backend)
+            if not isinstance(enc, bitvector.BitVector):
+                enc = be.bitvector(encoding.tobits(enc))
+            enc = be.parentheses(enc)
         self.enc = enc
+        self.levels = None
+        self.ancestors = None
         self._node = nodecls
+        self._height = None
+        self._minima = None
 
     def __len__(self):
         return len(self.enc) / 2
@@ -230,6 +282,10 @@ class Navigator(collections.Sequence):
             raise IndexError('index out of range')
         return self.node(self.select(n))
 
+    def __iter__(self):
+        """iterate the tree in preorder"""
+        return self.iterate()
+
     def __reversed__(self):
         """iterate the tree in reverse preorder"""
         return self.iterate(idx=slice(None, None, -1))
@@ -242,7 +298,8 @@ class Navigator(collections.Sequence):
         """iterate the tree in pre- or post-order.
 
         idx can be a starting offset, or a slice giving start, stop,
-        and stride.
+        and stride. with a stride of 1 or -1, the nodes are found in a
+        single pass over the encoding (see traverse).
 
         """
         zlice = (
@@ -252,18 +309,193 @@ class Navigator(collections.Sequence):
             if isinstance(idx, numbers.Integral) else
             slice(None)
         )
-        nodes = xrange(*zlice.indices(len(self)))
+        start, stop, stride = zlice.indices(len(self))
+        nodes = xrange(start, stop, stride)
         select = self.select if preorder else self.postselect
 
+        if nodes and abs(stride) == 1:
+            # scan from the first node's (pre) or last (post) parenthesis
+            pos = (
+                self.select(start)
+                if preorder else
+                self.enc.select(')', start + 1)
+            )
+            lo, hi = (pos, len(self.enc)) if stride > 0 else (0, pos + 1)
+            for pos, _, _ in itertools.islice(
+                    self._scan(lo, hi, preorder, stride < 0),
+                    len(nodes)
+            ):
+                yield self._node(self, pos)
+            return
+
         for n in nodes:
             yield self.node(select(n))
 
+    def traverse(self, pos=0, preorder=True, reverse=False, leaves=False,
+                 depth=None):
+        """iterate the subtree of the node at pos in a single pass over
+        its parentheses.
+
+        yields the position, depth, and preorder rank of each node, in
+        pre- or post-order, or in the reverse of either.
+
+        :param int pos: the position of the subtree root
+        :param bool preorder: whether to iterate in preorder
+        :param bool reverse: whether to iterate in reverse order
+        :param bool leaves: whether to only yield leaves
+        :param depth: if given, only yield nodes at this depth
+
+        """
+        if self.enc[pos] != '(':
+            raise ValueError('no node at position {}'.format(pos))
+        nodes = self._scan(
+            pos, self.enc.close(pos) + 1, preorder, reverse, leaves
+        )
+        if depth is None:
+            return nodes
+        return (node for node in nodes if node[1] == depth)
+
+    def _bits(self, lo, hi, reverse=False):
+        """iterate the bits of the encoding from lo to hi, in chunks"""
+        starts = xrange(lo, hi, self.SCAN)
+        for start in reversed(starts) if reverse else starts:
+            bits = self.enc.bv[start:min(start + self.SCAN, hi)]
+            for bit in reversed(bits) if reverse else bits:
+                yield bit
+
+    def _scan(self, lo, hi, preorder=True, reverse=False, leaves=False):
+        """iterate the (position, depth, rank) of the nodes whose pre-
+        (or post-) order parentheses lie between positions lo and hi"""
+        # pylint: disable=R0912
+        enc, prev = self.enc, None
+        if not reverse:
+            depth = enc.excess(lo - 1) if lo else 0
+            rank = self.rank(lo - 1) + 1 if lo else 0
+            stack = []
+            for pos, bit in enumerate(self._bits(lo, hi), lo):
+                if bit == '1':
+                    depth += 1
+                    if preorder and not leaves:
+                        yield pos, depth, rank
+                    elif not leaves:
+                        stack.append((pos, rank))
+                    rank += 1
+                else:
+                    if leaves:
+                        if prev == '1':
+                            yield pos - 1, depth, rank - 1
+                    elif not preorder:
+                        # parents opened before lo are found with open()
+                        node = stack.pop() if stack else (
+                            enc.open(pos), self.rank(enc.open(pos))
+                        )
+                        yield node[0], depth, node[1]
+                    depth -= 1
+                prev = bit
+            return
+
+        depth = enc.excess(hi - 1)
+        rank = self.rank(hi - 1)
+        # postorder nodes are pending until their opening parenthesis
+        # is reached; those still open are on the stack, and are found
+        # with open() if too many are pending, or at lo
+        pending, stack = [], []
+        for pos, bit in enumerate(self._bits(lo, hi, True)):
+            pos = hi - 1 - pos
+            if bit == '1':
+                if leaves:
+                    if prev == '0':
+                        yield pos, depth, rank
+                elif preorder:
+                    yield pos, depth, rank
+                elif stack:
+                    node = stack.pop()
+                    if node is not None:
+                        node[0], node[2] = pos, rank
+                rank -= 1
+                depth -= 1
+            else:
+                if not (leaves or preorder):
+                    pending.append([pos, depth + 1, None])
+                    stack.append(pending[-1])
+                depth += 1
+            prev = bit
+            if pending and (
+                    not stack or stack[-1] is None or
+                    len(pending) >= self.SCAN):
+                self._opened(stack)
+                for node in pending:
+                    yield tuple(node)
+                pending, stack = [], [None] * len(stack)
+        self._opened(stack)
+        for node in pending:
+            yield tuple(node)
+
+    def _opened(self, stack):
+        """find the opening parentheses of pending postorder nodes"""
+        for node in stack:
+            if node is not None:
+                node[0] = self.enc.open(node[0])
+                node[2] = self.rank(node[0])
+
     def node(self, pos):
         """return the node at position pos"""
         if self.enc[pos] != '(':
             raise ValueError('no node at position {}'.format(pos))
         return self._node(self, pos)
 
+    def cursor(self, pos=0):
+        """return a cursor at position pos (see Cursor)"""
+        if self.enc[pos] != '(':
+            raise ValueError('no node at position {}'.format(pos))
+        return Cursor(self, pos)
+
+    def parentpos(self, pos):
+        """return the position of the parent of the node at pos, or
+        None for the root"""
+        if not pos:
+            return None
+        if self.ancestors is not None:
+            return self.ancestors.ancestor(pos, 1)
+        return self.enc.enclose(pos)
+
+    def rootpath(self, pos):
+        """iterate the positions from the node at pos up to the root"""
+        if self.ancestors is not None:
+            return self.ancestors.rootpath(pos)
+        return self._rootpath(pos)
+
+    def _rootpath(self, pos):
+        while pos is not None:
+            yield pos
+            pos = self.parentpos(pos)
+
+    def firstchildpos(self, pos):
+        """return the position of the first child of the node at pos,
+        or None for a leaf"""
+        return None if self.enc[pos + 1] == ')' else pos + 1
+
+    def lastchildpos(self, pos):
+        """return the position of the last child of the node at pos, or
+        None for a leaf"""
+        pos = self.enc.close(pos) - 1
+        return None if self.enc[pos] == '(' else self.enc.open(pos)
+
+    def nextsiblingpos(self, pos):
+        """return the position of the next sibling of the node at pos,
+        or None for the last child"""
+        if not pos:
+            return None
+        pos = self.enc.close(pos) + 1
+        return None if self.enc[pos] == ')' else pos
+
+    def prevsiblingpos(self, pos):
+        """return the position of the previous sibling of the node at
+        pos, or None for the first child"""
+        if not pos or self.enc[pos - 1] != ')':
+            return None
+        return self.enc.open(pos - 1)
+
     def select(self, k):
         """return the position of node k"""
         return self.enc.select('(', k + 1)
@@ -294,16 +526,123 @@ class Navigator(collections.Sequence):
             return 1
         return self.enc.countmin(self.node(pos).parent().pos + 1, pos) + 1
 
+    def minima(self):
+        """return the range minimum index of the excess (see
+        vectorized.ExcessMinima), building it if necessary.
+
+        :raises ImportError: if numpy is not installed
+
+        """
+        if self._minima is None:
+            from succinct import vectorized
+            self._minima = vectorized.ExcessMinima(self.enc)
+        return self._minima
+
+    def to_arrays(self, fields=None):
+        """return arrays of per-node values, indexed by preorder rank.
+
+        the arrays are computed in a single vectorized pass over the
+        encoding (see vectorized.nodearrays), which requires numpy.
+
+        :param fields: the names of the arrays, among 'pos', 'depth',
+        'parent', 'size' and 'degree' (defaults to all)
+        :returns: a dict of numpy arrays, by name
+
+        """
+        from succinct import vectorized
+        return vectorized.nodearrays(self.enc, fields or vectorized.FIELDS)
+
+    def rank_many(self, pos):
+        """return the preorder ranks of the nodes at positions pos, as a
+        numpy array, counted with the rank directory of the encoding"""
+        from succinct import vectorized
+        return vectorized.ranks(self.enc.bv, pos) - 1
+
+    def lca_many(self, a, b):
+        """return the lowest common ancestors of pairs of nodes.
+
+        the pairs are answered together, with vectorized range minimum
+        queries over the excess (see minima).
+
+        :param a: the positions of the first node of each pair
+        :param b: the positions of the second node of each pair
+        :returns: the positions of the ancestors, as a numpy array
+
+        """
+        return self.minima().lca(a, b)
+
+    def ancestor_many(self, pos, d):
+        """return the ancestors d levels up of nodes (see
+        Node.ancestor), or -1 where there is none.
+
+        :param pos: the positions of the nodes
+        :param d: the number of levels up, for all or each node
+        :returns: the positions of the ancestors, as a numpy array
+
+        """
+        return self.minima().ancestor(pos, d)
+
+    def height(self):
+        """return the height of the tree (the height of its root)"""
+        if self._height is None:
+            self._height = self.root().height()
+        return self._height
+
+    def indexlevels(self, backend=None):
+        """index the nodes by depth (see Levels), if not already done.
+
+        once indexed, the level navigation methods of the navigator
+        and its nodes use the index.
+
+        :param backend: the backend (or its name) used to encode the
+        index; see backends.get
+        :rtype: Levels
+
+        """
+        if self.levels is None:
+            self.levels = Levels(self, backend)
+        return self.levels
+
+    def indexancestors(self):
+        """index the ancestors of the nodes (see Ancestors), if not
+        already done.
+
+        once indexed, the parent, ancestor and root path methods of the
+        navigator and its nodes use the index.
+
+        :rtype: Ancestors
+
+        """
+        if self.ancestors is None:
+            self.ancestors = Ancestors(self)
+        return self.ancestors
+
+    def levelorder(self, d=1):
+        """iterate the nodes in level order (breadth first), starting
+        with depth d.
+
+        yields the position, depth, and preorder rank of each node, as
+        traverse does, and indexes the levels if necessary.
+
+        """
+        levels = self.indexlevels()
+        for pos, depth in levels.iterate(d):
+            yield pos, depth, self.rank(pos)
+
     def levelleftmost(self, d):
         """return the leftmost node with depth d"""
-        if d < 1 or d > self.root().height() + 1:
+        if d < 1 or d > self.height() + 1:
             return None
+        if self.levels is not None:
+            return self._node(self, self.levels.leftmost(d))
         return self.node(self.enc.fwdsearch(-1, d))
 
     def levelrightmost(self, d):
         """return the rightmost node with depth d"""
-        if d < 1 or d > self.root().height() + 1:
+        if d < 1 or d > self.height() + 1:
             return None
+        if self.levels is not None:
+            return self._node(self, self.levels.rightmost(d))
         return self.node(
             self.enc.open(
                 self.enc.bwdsearch(
@@ -311,3 +650,415 @@ class Navigator(collections.Sequence):
                 )
             )
         )
+
+class Levels(object):
+    """an index of the nodes of a tree grouped by depth.
+
+    the positions of the nodes are listed in level order, i.e., by
+    depth and then by position, and stored as an elias-fano sequence
+    of keys (depth - 1) * N + pos, where N is the length of the
+    encoding. the offset of the first node of each depth is kept
+    alongside, so that the leftmost and rightmost nodes of a level
+    take a single access, and the next or previous node at the same
+    depth a search within one elias-fano bucket.
+
+    """
+
+    def __init__(self, nav, backend=None):
+        assert isinstance(nav, Navigator)
+        self.size = len(nav.enc)
+        depths = []
+        for pos, depth, _ in nav.traverse():
+            if depth > len(depths):
+                depths.append([])
+            depths[depth - 1].append(pos)
+
+        self.starts = array.array(bitvector.WORDTYPE, [0])
+        keys = array.array(bitvector.WORDTYPE)
+        for d, positions in enumerate(depths):
+            keys.extend(d * self.size + pos for pos in positions)
+            self.starts.append(len(keys))
+        self.keys = backends.get(backend).eliasfano(keys, backend)
+
+    def __len__(self):
+        """return the number of levels"""
+        return len(self.starts) - 1
+
+    def _pos(self, idx, d):
+        """return the position of the idx-th node, at depth d"""
+        return int(self.keys[idx]) - (d - 1) * self.size
+
+    def _index(self, pos, d):
+        """return the level-order index of the node at pos, of depth d"""
+        return self.keys.next_geq((d - 1) * self.size + pos)
+
+    def count(self, d):
+        """return the number of nodes at depth d"""
+        return self.starts[d] - self.starts[d - 1]
+
+    def leftmost(self, d):
+        """return the position of the leftmost node at depth d"""
+        return self._pos(self.starts[d - 1], d)
+
+    def rightmost(self, d):
+        """return the position of the rightmost node at depth d"""
+        return self._pos(self.starts[d] - 1, d)
+
+    def next(self, pos, d):
+        """return the position of the next node at depth d after the
+        node at pos, or None"""
+        idx = self._index(pos, d) + 1
+        return self._pos(idx, d) if idx < self.starts[d] else None
+
+    def prev(self, pos, d):
+        """return the position of the previous node at depth d before
+        the node at pos, or None"""
+        idx = self._index(pos, d) - 1
+        return self._pos(idx, d) if idx >= self.starts[d - 1] else None
+
+    def iterate(self, d=1):
+        """iterate the position and depth of the nodes in level order,
+        starting with depth d"""
+        if d > len(self):
+            return
+        keys = self.keys.iter_from(self.starts[d - 1])
+        for depth in xrange(d, len(self) + 1):
+            offset = (depth - 1) * self.size
+            for key in itertools.islice(keys, self.count(depth)):
+                yield key - offset, depth
+
+class Ancestors(object):
+    """a level ancestor index of a tree.
+
+    the tree is decomposed into longest paths, each running from a
+    node down to its deepest leaf. each path of h nodes is extended
+    upwards by up to h ancestors into a ladder, and the leaf at its
+    bottom keeps jump pointers to its 2^k-th ancestors. a node's
+    ancestor d levels up is either on the node's own ladder or, after
+    one jump from the leaf of its path, on the ladder of the node
+    jumped to, so it is found in constant time.
+
+    for more details, see `"the level ancestor problem simplified"
+    <http://dx.doi.org/10.1016/j.tcs.2003.05.002>`_.
+
+    """
+
+    def __init__(self, nav):
+        assert isinstance(nav, Navigator)
+        self.nav = nav
+        n = len(nav)
+        positions = array.array(bitvector.WORDTYPE, [0]) * n
+        parents = array.array('l', [-1]) * n
+        depths = array.array('l', [0]) * n
+        heights = array.array('l', [0]) * n
+        longest = array.array('l', [-1]) * n
+
+        stack = []
+        for pos, depth, rank in nav.traverse():
+            del stack[depth - 1:]
+            positions[rank], depths[rank] = pos, depth
+            if stack:
+                parents[rank] = stack[-1]
+            stack.append(rank)
+        for rank in xrange(n - 1, 0, -1):
+            parent = parents[rank]
+            if longest[parent] < 0 or heights[rank] >= heights[parent]:
+                heights[parent], longest[parent] = heights[rank] + 1, rank
+
+        # the ladders, top to bottom, and the position of each node in
+        # the ladder of its path
+        self.ladders = array.array(bitvector.WORDTYPE)
+        self.rungs = array.array(bitvector.WORDTYPE, [0]) * n
+        self.paths = array.array(bitvector.WORDTYPE, [0]) * n
+        self.starts = array.array(bitvector.WORDTYPE)
+        self.ends = array.array(bitvector.WORDTYPE)
+        for top in xrange(n):
+            if top and longest[parents[top]] == top:
+                continue
+            path, rank = [], top
+            while rank >= 0:
+                path.append(rank)
+                rank = longest[rank]
+            extension, rank = [], parents[top]
+            while rank >= 0 and len(extension) < len(path):
+                extension.append(rank)
+                rank = parents[rank]
+
+            self.starts.append(len(self.ladders))
+            self.ladders.extend(positions[r] for r in reversed(extension))
+            for rank in path:
+                self.rungs[rank] = len(self.ladders)
+                self.paths[rank] = len(self.starts) - 1
+                self.ladders.append(positions[rank])
+            self.ends.append(len(self.ladders))
+
+        # the jump pointers of the leaf at the bottom of each path
+        self.jumps = array.array(bitvector.WORDTYPE)
+        self.offsets = array.array(bitvector.WORDTYPE)
+        for path in xrange(len(self.starts)):
+            self.offsets.append(len(self.jumps))
+            leaf = self.ends[path] - 1
+            up = depths[nav.rank(self.ladders[leaf])] - 1
+            if up:
+                self.jumps.append(self.ladders[leaf - 1])
+            k = 1
+            while 1 << k <= up:
+                # climb the ladder of the previous jump
+                self.jumps.append(self._climb(self.jumps[-1], 1 << (k - 1)))
+                k += 1
+        self.offsets.append(len(self.jumps))
+
+    def _climb(self, pos, d):
+        """return the ancestor d levels up of the node at pos, which
+        must be on the ladder of its path"""
+        return self.ladders[self.rungs[self.nav.rank(pos)] - d]
+
+    def ancestor(self, pos, d):
+        """return the position of the ancestor d levels up of the node
+        at pos, which must exist"""
+        rank = self.nav.rank(pos)
+        rung, path = self.rungs[rank], self.paths[rank]
+        if rung - d >= self.starts[path]:
+            return self.ladders[rung - d]
+        # jump from the leaf of the path, then climb a ladder
+        d += self.ends[path] - 1 - rung
+        k = d.bit_length() - 1
+        return self._climb(self.jumps[self.offsets[path] + k], d - (1 << k))
+
+    def rootpath(self, pos):
+        """iterate the positions from the node at pos up to the root"""
+        while True:
+            rank = self.nav.rank(pos)
+            rung = self.rungs[rank]
+            start = self.starts[self.paths[rank]]
+            for idx in xrange(rung, start - 1, -1):
+                yield self.ladders[idx]
+            pos = self.ladders[start]
+            if not pos:
+                return
+            # continue from the ladder of the top node's own path
+            rank = self.nav.rank(pos)
+            pos = self.ladders[self.rungs[rank] - 1]
+
+class Cursor(object):
+    """a mutable position in a tree, for traversals that do not
+    allocate a node per step.
+
+    the navigation methods move the cursor and return True, or leave
+    it in place and return False if there is no such node. the cursor
+    tracks the depth of its node as it moves.
+
+    """
+    __slots__ = ('nav', 'pos', 'depth')
+
+    def __init__(self, nav, pos=0):
+        assert isinstance(nav, Navigator)
+        self.nav = nav
+        self.pos = pos
+        self.depth = nav.enc.excess(pos)
+
+    def __str__(self):
+        return 'Cursor(pos={}, depth={})'.format(self.pos, self.depth)
+
+    def node(self):
+        """return the node at the cursor"""
+        return self.nav.node(self.pos)
+
+    def _move(self, pos, delta):
+        if pos is None:
+            return False
+        self.pos = pos
+        self.depth += delta
+        return True
+
+    def parent(self):
+        """move to the parent"""
+        return self._move(self.nav.parentpos(self.pos), -1)
+
+    def firstchild(self):
+        """move to the first child"""
+        return self._move(self.nav.firstchildpos(self.pos), 1)
+
+    def lastchild(self):
+        """move to the last child"""
+        return self._move(self.nav.lastchildpos(self.pos), 1)
+
+    def nextsibling(self):
+        """move to the next sibling"""
+        return self._move(self.nav.nextsiblingpos(self.pos), 0)
+
+    def prevsibling(self):
+        """move to the previous sibling"""
+        return self._move(self.nav.prevsiblingpos(self.pos), 0)
+
+    def advance(self, top=0):
+        """move to the next node in preorder, not leaving the subtree
+        of the ancestor (or self) at position top"""
+        return self.firstchild() or self.skip(top)
+
+    def skip(self, top=0):
+        """move to the next node in preorder that is not a descendant,
+        not leaving the subtree of the ancestor at position top (or
+        the tree, if top is not an ancestor)"""
+        pos, depth = self.pos, self.depth
+        while self.pos != top:
+            if self.nextsibling():
+                return True
+            if not self.parent():
+                break
+        self.pos, self.depth = pos, depth
+        return False
+
+def _typecode(values):
+    """return the narrowest array typecode holding numeric values"""
+    if any(isinstance(val, float) for val in values):
+        return 'd'
+    lo, hi = (min(values), max(values)) if values else (0, 0)
+    for typecode in ('BHIL' if lo >= 0 else 'bhil'):
+        bits = 8 * array.array(typecode).itemsize
+        if typecode.isupper():
+            bits += 1  # no sign bit
+        if -(1 << bits - 1) <= lo and hi < 1 << bits - 1:
+            return typecode
+    raise OverflowError('values do not fit in 64 bits')
+
+class Column(collections.Sequence):
+    """a column of numeric node labels, stored in a typed array"""
+
+    def __init__(self, values, typecode=None):
+        """store labels.
+
+        :param values: the labels, by preorder rank
+        :param typecode: the array typecode of the labels; defaults to
+        the narrowest integer type holding them, or 'd' for floats
+
+        """
+        values = list(values)
+        self.array = array.array(typecode or _typecode(values), values)
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, rank):
+        return self.array[rank]
+
+    def take(self, ranks):
+        """return the labels of the nodes of the given ranks, as a numpy
+        array"""
+        import numpy
+        if not self.array:
+            labels = numpy.zeros(0, dtype=self.array.typecode)
+        else:
+            labels = numpy.frombuffer(self.array, dtype=self.array.typecode)
+        return labels[numpy.asarray(ranks, dtype=numpy.int64)]
+
+class DictionaryColumn(Column):
+    """a column of node labels, stored as codes into a dictionary of
+    their distinct values"""
+
+    def __init__(self, values, typecode=None):
+        """store labels.
+
+        :param values: the labels, by preorder rank
+        :param typecode: the array typecode of the codes; defaults to
+        the narrowest unsigned type holding them
+
+        """
+        # pylint: disable=W0231
+        index = {}
+        self.codes = Column(
+            (index.setdefault(val, len(index)) for val in values), typecode
+        )
+        self.values = sorted(index, key=index.get)
+
+    @property
+    def array(self):
+        """the array of codes"""
+        return self.codes.array
+
+    def __getitem__(self, rank):
+        return self.values[self.codes[rank]]
+
+    def take(self, ranks):
+        import numpy
+        return numpy.array(self.values, dtype=object)[self.codes.take(ranks)]
+
+class Tree(object):
+    """models an ordinal tree with labeled nodes.
+
+    the labels are stored by column: each column holds one label of
+    every node, indexed by preorder rank, in a typed array of fixed
+    width numbers or of codes into a dictionary of distinct values
+    (see Column and DictionaryColumn). a label takes a few bytes, and
+    the labels of many nodes are gathered at once as numpy arrays.
+
+    """
+
+    def __init__(self, nav, columns=None):
+        """instantiate a tree.
+
+        :param Navigator nav: the structure of the tree
+        :param columns: a mapping of column names to labels, by
+        preorder rank (see addcolumn)
+
+        """
+        assert isinstance(nav, Navigator)
+        self.nav = nav
+        self.columns = collections.OrderedDict()
+        for name, values in (columns or {}).items():
+            self.addcolumn(name, values)
+
+    def __len__(self):
+        return len(self.nav)
+
+    def __getitem__(self, name):
+        """return the named column"""
+        return self.columns[name]
+
+    def addcolumn(self, name, values, typecode=None):
+        """add a column of labels.
+
+        strings are dictionary-encoded, and other labels stored as
+        numbers (see Column).
+
+        :param str name: the column name
+        :param values: the labels of the nodes, by preorder rank
+        :param typecode: the array typecode of the labels (or codes)
+        :raises ValueError: if there is not one label per node
+
+        """
+        if isinstance(values, Column):
+            column = values
+        else:
+            values = list(values)
+            column = (
+                DictionaryColumn
+                if any(isinstance(val, basestring) for val in values) else
+                Column
+            )(values, typecode)
+        if len(column) != len(self.nav):
+            raise ValueError('expected {} labels, not {}'.format(
+                len(self.nav), len(column)
+            ))
+        self.columns[name] = column
+        return column
+
+    def label(self, pos, name):
+        """return the named label of the node at pos"""
+        return self.columns[name][self.nav.rank(pos)]
+
+    def labels(self, pos):
+        """return all the labels of the node at pos, by column name"""
+        rank = self.nav.rank(pos)
+        return collections.OrderedDict(
+            (name, column[rank]) for name, column in self.columns.items()
+        )
+
+    def gather(self, name, pos):
+        """return the named labels of the nodes at positions pos, as a
+        numpy array.
+
+        :raises ImportError: if numpy is not installed
+
+        """
+        return self.columns[name].take(self.nav.rank_many(pos))
@@ -0,0 +1,1113 @@
+"""numpy-accelerated succinct data structures.
+
+the classes in this module store exactly the same data as their pure
+python counterparts, and answer queries with the same code, but build
+their indexes with vectorized numpy operations. importing this module
+raises ImportError if numpy is not installed; see the backends module
+for selecting an implementation.
+
+"""
+
+from __future__ import absolute_import
+
+import sys
+import array
+
+import numpy
+
+from succinct import (
+    scanner,
+    bitvector,
+    encoding,
+)
+
+WORD = numpy.dtype('<u8')
+
+# number of set bits in each byte
+POPCOUNT8 = numpy.array(
+    [bitvector.popcount(b) for b in xrange(256)], dtype=numpy.int64
+)
+
+CHUNK = 1 << 16  # words per vectorized pass
+
+SCANCHUNK = 1 << 22  # characters per vectorized scanning pass
+
+# whether each byte is structural, a quote or a backslash
+SYMBOLS = numpy.zeros(256, dtype=bool)
+SYMBOLS[[
+    ord(c) for c in
+    scanner.OPENING + scanner.CLOSING + scanner.SEPARATORS + '"\\'
+]] = True
+
+def _halfwordtables():
+    """return the change in excess over each 16-bit value and its
+    least prefix excess, from the per-byte tables"""
+    delta = numpy.array(encoding.DELTA, dtype=numpy.int16)
+    mins = numpy.array(encoding.MINPREFIX, dtype=numpy.int16)
+    lo, hi = numpy.arange(1 << 16) & 255, numpy.arange(1 << 16) >> 8
+    return (
+        delta[lo] + delta[hi],
+        numpy.minimum(mins[lo], delta[lo] + mins[hi]),
+    )
+
+DELTA16, MINPREFIX16 = _halfwordtables()
+
+def vector(words):
+    """return a (transient) numpy view of an array of 64-bit words.
+
+    the view must not outlive modifications to the array.
+
+    """
+    if not len(words):
+        return numpy.zeros(0, dtype=WORD)
+    return numpy.frombuffer(words, dtype=WORD)
+
+def toarray(typecode, values):
+    """return the numpy values as an array.array of the given type"""
+    dtype = {
+        'H': numpy.uint16,
+        'I': numpy.uint32,
+        'i': numpy.int32,
+        bitvector.WORDTYPE: WORD,
+    }[typecode]
+    return array.array(typecode, numpy.ascontiguousarray(
+        values, dtype=dtype
+    ).tobytes())
+
+def popcounts(words):
+    """return the number of set bits in each word of a numpy array"""
+    return POPCOUNT8[words.view(numpy.uint8)].reshape(-1, 8).sum(axis=1)
+
+def unpack(words):
+    """return the bits of a numpy word array, least significant first"""
+    return numpy.unpackbits(
+        words.view(numpy.uint8)
+    ).reshape(-1, 8)[:, ::-1].ravel()
+
+def pack(bits):
+    """return an array.array of words packing bits (least significant
+    first), padded with zeros"""
+    bits = numpy.asarray(bits, dtype=numpy.uint8)
+    padded = numpy.zeros(-(-len(bits) // 64) * 64, dtype=numpy.uint8)
+    padded[:len(bits)] = bits
+    packed = numpy.packbits(padded.reshape(-1, 8)[:, ::-1])
+    return toarray(bitvector.WORDTYPE, packed.view(WORD))
+
+def setbits(positions, nbits):
+    """return an array.array of words with the given (sorted, distinct)
+    bit positions set"""
+    words = numpy.zeros(-(-nbits // 64), dtype=WORD)
+    orbits(words, positions)
+    return toarray(bitvector.WORDTYPE, words)
+
+def orbits(words, positions):
+    """set the given (sorted, distinct) bit positions in a numpy word
+    array"""
+    positions = numpy.asarray(positions, dtype=numpy.int64)
+    if len(positions):
+        idx = positions >> 6
+        masks = numpy.left_shift(
+            numpy.uint64(1), (positions & 63).astype(WORD)
+        )
+        starts = numpy.flatnonzero(numpy.r_[True, idx[1:] != idx[:-1]])
+        words[idx[starts]] |= numpy.bitwise_or.reduceat(masks, starts)
+
+def countones(words, nbits):
+    """return the number of set bits among the first nbits bits of a
+    numpy word array, counted CHUNK words at a time"""
+    words = words[:-(-nbits // 64)]
+    count = 0
+    for start in xrange(0, len(words), CHUNK):
+        count += int(popcounts(words[start:start + CHUNK]).sum())
+    if nbits % 64:
+        count -= bitvector.popcount(int(words[-1]) >> nbits % 64)
+    return count
+
+def onechunks(words, nbits):
+    """iterate numpy arrays of the positions of the set bits among the
+    first nbits bits of a numpy word array, CHUNK words at a time"""
+    for start in xrange(0, len(words), CHUNK):
+        positions = numpy.flatnonzero(unpack(words[start:start + CHUNK]))
+        positions += start * 64
+        yield positions[positions < nbits]
+
+def regroup(arrays, size):
+    """iterate the concatenation of numpy arrays in pieces of size
+    elements (the last may be shorter)"""
+    pending, count = [], 0
+    for values in arrays:
+        pending.append(values)
+        count += len(values)
+        if count < size:
+            continue
+        merged = numpy.concatenate(pending)
+        full = len(merged) // size * size
+        for start in xrange(0, full, size):
+            yield merged[start:start + size]
+        pending, count = [merged[full:]], len(merged) - full
+    if count:
+        yield numpy.concatenate(pending)
+
+def ranks(bv, pos):
+    """return the number of set bits at or before each of the positions
+    pos of a PackedBitVector, from its rankdirectory"""
+    pos = numpy.asarray(pos, dtype=numpy.int64)
+    if not len(pos):
+        return numpy.zeros(0, dtype=numpy.int64)
+    idx = bv.rankdirectory()
+    words = vector(bv.words)
+    w = pos >> 6
+    b = w // idx.block
+    cnt = (
+        vector(idx.supers)[w // idx.superblock].astype(numpy.int64) +
+        numpy.frombuffer(idx.blocks, dtype=numpy.uint16)[b]
+    )
+    # the whole words between the block and the position
+    for k in xrange(idx.block - 1):
+        j = b * idx.block + k
+        cnt += numpy.where(j < w, popcounts(words[numpy.minimum(j, w)]), 0)
+    masks = (
+        numpy.left_shift(numpy.uint64(2), (pos & 63).astype(WORD)) -
+        numpy.uint64(1)
+    )
+    return cnt + popcounts(words[w] & masks)
+
+class NumpyRankSelect(bitvector.RankSelect):
+    """a RankSelect whose directory and samples are computed by numpy"""
+
+    def __init__(self, word, nbits, words, **kwargs):
+        """build the index.
+
+        :param words: numpy array of the words returned by word
+
+        """
+        self._vector = words
+        try:
+            super(NumpyRankSelect, self).__init__(word, nbits, **kwargs)
+        finally:
+            del self._vector
+
+    def _build(self, zeros):
+        counts = popcounts(self._vector)
+        cum = numpy.cumsum(counts)
+        before = cum - counts
+        total = int(cum[-1]) if len(cum) else 0
+
+        supers = numpy.append(before[::self.superblock], total)
+        blockstarts = numpy.arange(0, len(counts), self.block)
+        blocks = (
+            before[blockstarts] -
+            before[blockstarts // self.superblock * self.superblock]
+        )
+
+        def sample(cum, total):
+            targets = numpy.arange(1, total + 1, self.sample)
+            return toarray(
+                'I',
+                numpy.searchsorted(cum, targets) // self.superblock
+            )
+
+        samples = {'1': sample(cum, total), '0': array.array('I')}
+        if zeros:
+            bits = numpy.minimum(
+                self.nbits, 64 * numpy.arange(1, len(counts) + 1)
+            )
+            samples['0'] = sample(bits - cum, self.nbits - total)
+        return (
+            toarray(bitvector.WORDTYPE, supers),
+            toarray('H', blocks),
+            samples,
+        )
+
+class NumpyBitVector(bitvector.PackedBitVector):
+    """a PackedBitVector whose indexes are built by numpy"""
+
+    def _patternwords(self, p):
+        """return a numpy array of the pattern mask words for p"""
+        w = vector(self._words)
+        if p == '1':
+            return w
+        carry = numpy.zeros(len(w), dtype=WORD)
+        carry[:-1] = (w[1:] & numpy.uint64(1)) << numpy.uint64(63)
+        valid = numpy.full(len(w), bitvector.MASK64, dtype=WORD)
+        if len(w):
+            valid[-1] = (1 << (self._len - (len(w) - 1) * self.WORD - 1)) - 1
+        nxt = (w >> numpy.uint64(1)) | carry
+        if p == '10':
+            return w & ~nxt & valid
+        return ~w & nxt & valid
+
+    def _buildindex(self, p):
+        return NumpyRankSelect(
+            self._patternword(p), self._len, self._patternwords(p),
+            zeros=p == '1',
+            block=self.BLOCK,
+            superblock=self.SUPERBLOCK,
+            sample=self.SAMPLE,
+        )
+
+    def ones(self):
+        for positions in onechunks(vector(self._words), self._len):
+            for pos in positions.tolist():
+                yield pos
+
+class NumpyBitVectorBuilder(bitvector.BitVectorBuilder):
+    """a BitVectorBuilder producing NumpyBitVectors"""
+
+    def __init__(self, cls=NumpyBitVector):
+        super(NumpyBitVectorBuilder, self).__init__(cls)
+
+    def appendwords(self, words, nbits):
+        offset = self._len % 64
+        if not offset or nbits < 64:
+            return super(NumpyBitVectorBuilder, self).appendwords(
+                words, nbits
+            )
+        # shift the words into place after the pending bits
+        w = vector(words)[:-(-nbits // 64)].copy()
+        if nbits % 64:
+            w[-1] &= numpy.uint64((1 << nbits % 64) - 1)
+        shifted = numpy.zeros(len(w) + 1, dtype=WORD)
+        shifted[:-1] = w << numpy.uint64(offset)
+        shifted[1:] |= w >> numpy.uint64(64 - offset)
+        shifted[0] |= numpy.uint64(self._word)
+        full = (offset + nbits) // 64
+        self._words.extend(toarray(bitvector.WORDTYPE, shifted[:full]))
+        self._word = int(shifted[full]) if (offset + nbits) % 64 else 0
+        self._len += nbits
+
+class NumpyRangeMinMaxParentheses(encoding.RangeMinMaxParentheses):
+    """a RangeMinMaxParentheses whose tree is built by numpy"""
+
+    def __init__(self, bv, trusted=False):
+        if not isinstance(bv, bitvector.PackedBitVector):
+            bv = NumpyBitVector(str(bv))
+        super(NumpyRangeMinMaxParentheses, self).__init__(bv, trusted)
+
+    def _build(self):
+        n, block = len(self), self.BLOCK
+        nblocks = max(1, -(-n // block))
+        size = 1
+        while size < nblocks:
+            size *= 2
+        mins = numpy.full(2 * size, self.INF, dtype=numpy.int64)
+        maxs = numpy.full(2 * size, -self.INF, dtype=numpy.int64)
+        nmins = numpy.zeros(2 * size, dtype=numpy.int64)
+
+        # summarize the blocks a chunk of whole blocks at a time
+        w, e, step = vector(self.bv.words), 0, block * 64
+        for a in xrange(0, n, step):
+            b = min(n, a + step)
+            bits = unpack(w[a // 64:-(-b // 64)])[a % 64:a % 64 + b - a]
+            excess = e + numpy.cumsum(2 * bits.astype(numpy.int64) - 1)
+            e = int(excess[-1])
+            pad = -len(excess) % block
+            lo = numpy.append(excess, [self.INF] * pad).reshape(-1, block)
+            hi = numpy.append(excess, [-self.INF] * pad).reshape(-1, block)
+            leaves = size + a // block + numpy.arange(len(lo))
+            mins[leaves] = lo.min(axis=1)
+            maxs[leaves] = hi.max(axis=1)
+            nmins[leaves] = (lo == mins[leaves][:, None]).sum(axis=1)
+
+        # combine the levels bottom-up
+        level = size // 2
+        while level:
+            l = numpy.arange(2 * level, 4 * level, 2)
+            r = l + 1
+            v = numpy.arange(level, 2 * level)
+            mins[v] = numpy.minimum(mins[l], mins[r])
+            maxs[v] = numpy.maximum(maxs[l], maxs[r])
+            nmins[v] = (
+                numpy.where(mins[l] == mins[v], nmins[l], 0) +
+                numpy.where(mins[r] == mins[v], nmins[r], 0)
+            )
+            level //= 2
+
+        self._size = size
+        self._mins, self._maxs = toarray('i', mins), toarray('i', maxs)
+        self._nmins = toarray('i', nmins)
+
+FIELDS = ('pos', 'depth', 'parent', 'size', 'degree')
+
+def nodearrays(enc, fields=FIELDS):
+    """return arrays of per-node values of a balanced parentheses
+    encoding, indexed by preorder rank.
+
+    the encoding is scanned CHUNK words at a time, carrying the excess
+    and the open node at each depth between chunks. a node's depth is
+    the excess at its opening parenthesis, and since the nodes of each
+    depth open and close in turn, bucketing the parentheses of a chunk
+    by depth pairs every node with its closing parenthesis (giving its
+    size) and puts each node right after its parent among the
+    parentheses one level up. nodes whose match lies in an earlier
+    chunk are paired with the carried open nodes instead.
+
+    :param fields: the names of the arrays, among FIELDS: the position,
+    depth, parent (-1 for the root), number of descendants (including
+    the node itself) and number of children of each node
+    :returns: a dict of the arrays, by name
+
+    """
+    for field in fields:
+        if field not in FIELDS:
+            raise ValueError('unknown field {}'.format(field))
+    bv = enc.bv
+    if not isinstance(bv, bitvector.PackedBitVector):
+        bv = NumpyBitVector(str(bv))
+    n = len(bv)
+    words = vector(bv.words)[:-(-n // 64)]
+    count = countones(words, n)
+    pairs = set(fields) & set(['parent', 'size', 'degree'])
+    dtype = numpy.int32 if n < 1 << 31 else numpy.int64
+
+    arrays = dict(
+        (field, numpy.empty(count, dtype=numpy.int64))
+        for field in ['pos', 'depth'] + (['parent', 'size'] if pairs else [])
+    )
+    stack = numpy.zeros(64, dtype=numpy.int64)  # open node of each depth
+    e, r = 0, 0
+    for start in xrange(0, len(words), CHUNK):
+        bits = unpack(words[start:start + CHUNK])[:n - 64 * start]
+        excess = e + numpy.cumsum(
+            2 * bits.astype(numpy.int8) - 1, dtype=dtype
+        )
+        e = int(excess[-1])
+        opens = numpy.flatnonzero(bits)
+        ranks = r + numpy.arange(len(opens))
+        arrays['pos'][ranks] = opens + 64 * start
+        arrays['depth'][ranks] = excess[opens]
+        if pairs:
+            stack = _pairnodes(bits, excess, start, r, stack, arrays)
+        r += len(opens)
+
+    if 'degree' in fields:
+        parent = arrays['parent']
+        arrays['degree'] = numpy.bincount(
+            parent[parent >= 0], minlength=count
+        )
+    return dict((field, arrays[field]) for field in fields)
+
+def _pairnodes(bits, excess, start, r, stack, arrays):
+    """fill in the parents and sizes of the nodes opened or closed in a
+    chunk of parentheses (see nodearrays).
+
+    :param start: the first word of the chunk
+    :param r: the preorder rank of the first node opened in the chunk
+    :param stack: the open node at each depth before the chunk
+    :returns: the open node at each depth after the chunk
+
+    """
+    m = len(bits)
+    nodedepth = excess + 1 - bits  # the depth of the node of each paren
+    # bucket the parens by depth: numpy sorts narrow integers stably
+    # with a radix sort
+    low = nodedepth.min()
+    narrow = numpy.uint16 if nodedepth.max() - low < 1 << 16 else None
+    order = numpy.argsort(
+        (nodedepth - low).astype(narrow or nodedepth.dtype), kind='mergesort'
+    )
+    depth = nodedepth[order].astype(numpy.int64)
+    isopen = bits[order].astype(bool)
+    rank = (numpy.cumsum(bits, dtype=numpy.int64) - 1 + r)[order]
+    change = depth[1:] != depth[:-1]
+    first, last = numpy.r_[True, change], numpy.r_[change, True]
+    if depth[-1] >= len(stack):
+        stack = numpy.append(stack, numpy.zeros(
+            max(len(stack), int(depth[-1]) + 1), dtype=numpy.int64
+        ))
+
+    # a close follows its open among the parens of its depth, or the
+    # open is carried from an earlier chunk
+    k = numpy.flatnonzero(~isopen)
+    node = numpy.where(
+        first[k], stack[depth[k]], rank[numpy.maximum(k - 1, 0)]
+    )
+    arrays['size'][node] = (
+        order[k] + 64 * start - arrays['pos'][node]
+    ) // 2 + 1
+
+    # the parent is the last open one level up, in this chunk or not
+    k = numpy.flatnonzero(isopen)
+    keys = depth * m + order
+    j = numpy.searchsorted(keys, keys[k] - m) - 1
+    local = (j >= 0) & (depth[numpy.maximum(j, 0)] == depth[k] - 1)
+    parent = numpy.where(
+        local, rank[numpy.maximum(j, 0)], stack[depth[k] - 1]
+    )
+    parent[depth[k] == 1] = -1
+    arrays['parent'][rank[k]] = parent
+
+    ends = numpy.flatnonzero(last & isopen)
+    stack[depth[ends]] = rank[ends]
+    return stack
+
+class ExcessMinima(object):
+    """batched range minimum queries over the excess of a balanced
+    parentheses encoding.
+
+    the encoding is divided into blocks of WORDS 64-bit words and
+    superblocks of BLOCKS blocks. each superblock keeps its excess
+    before it and its least excess, and each block keeps the same two
+    values as 16-bit offsets (from its superblock and from its own
+    excess before, respectively); the excess within words is computed
+    from the words themselves. a sparse table gives the first
+    superblock with the least excess over any power-of-two range of
+    superblocks. a range minimum then scans the (partial) words and
+    blocks at either end of the range and looks up two sparse table
+    entries for the superblocks between them, in a constant number of
+    vectorized passes per batch of queries.
+
+    searching backwards from a position for a smaller excess scans
+    its superblock the same way. when the search leaves the superblock
+    for a target no lower than the superblock's least excess (as when
+    finding a parent), the superblock holding the answer is looked up
+    among the pioneers of the superblock: the groups of nodes that are
+    open at its start and close within it, which take O(n / b) entries
+    in all for superblocks of b parentheses, since matching pairs
+    never cross. deeper targets climb jump pointers along the chain of
+    preceding superblocks with smaller minima, in O(log(n / b))
+    passes.
+
+    the index takes about 0.1 bits per parenthesis.
+
+    """
+
+    WORDS = 8  # words per block
+
+    BLOCKS = 32  # blocks per superblock, within 16-bit offsets
+
+    CHUNK = 1 << 14  # queries per vectorized pass
+
+    INF = numpy.iinfo(numpy.int64).max
+
+    def __init__(self, enc):
+        assert isinstance(enc, encoding.BalancedParentheses)
+        bv = enc.bv
+        if not isinstance(bv, bitvector.PackedBitVector):
+            bv = NumpyBitVector(str(bv))
+        n = len(bv)
+        self._words = vector(bv.words)[:-(-n // 64)]
+        self._last = len(self._words) - 1
+        # the padding of the last word is not part of the encoding, and
+        # reads as ones so that it never lowers a minimum
+        self._pad = numpy.uint64(
+            bitvector.MASK64 ^ ((1 << n % 64) - 1) if n % 64 else 0
+        )
+        nwords = self.WORDS * self.BLOCKS
+        nblocks = -(-len(self._words) // self.WORDS)
+        nsupers = -(-nblocks // self.BLOCKS)
+        self._blocks = numpy.zeros(nblocks, dtype=numpy.int16)
+        self._blockmins = numpy.zeros(nblocks, dtype=numpy.int16)
+        self._supers = numpy.zeros(nsupers, dtype=numpy.int64)
+        self._supermins = numpy.zeros(nsupers, dtype=numpy.int64)
+
+        # summarize whole superblocks a chunk at a time
+        step, e = max(CHUNK // nwords, 1) * nwords, 0
+        for start in xrange(0, len(self._words), step):
+            w = numpy.arange(start, min(start + step, len(self._words)))
+            delta, mins = self._wordstats(w)
+            before = e + numpy.cumsum(delta) - delta
+            e = int(before[-1] + delta[-1])
+            mins = mins + before
+            pad = -len(w) % nwords
+            mins = numpy.append(mins, [self.INF] * pad)
+            before = numpy.append(before, [0] * pad)
+            b = start // self.WORDS + numpy.arange(len(mins) // self.WORDS)
+            s = start // nwords + numpy.arange(len(mins) // nwords)
+            bbefore = before[::self.WORDS]
+            bmins = mins.reshape(-1, self.WORDS).min(axis=1)
+            sbefore = before[::nwords]
+            valid = b < nblocks
+            self._blocks[b[valid]] = (
+                bbefore - numpy.repeat(sbefore, self.BLOCKS)
+            )[valid]
+            self._blockmins[b[valid]] = (bmins - bbefore)[valid]
+            self._supers[s] = sbefore
+            self._supermins[s] = bmins.reshape(-1, self.BLOCKS).min(axis=1)
+
+        table = [numpy.arange(nsupers, dtype=numpy.int32)]
+        while 2 << len(table) <= 2 * nsupers:
+            half = 1 << (len(table) - 1)
+            left, right = table[-1][:-half], table[-1][half:]
+            table.append(numpy.where(
+                self._supermins[left] <= self._supermins[right], left, right
+            ))
+        self._table = table
+        self._pioneers()
+
+    def _pioneers(self):
+        """index, for each superblock, where the nodes open at its start
+        (down to its least excess) open, as the superblocks holding the
+        positions right before them, and the chain of preceding
+        superblocks with smaller minima.
+
+        a node of depth t open at the start of superblock s opens right
+        after the last position before s with an excess less than t,
+        which lies in the last superblock before s whose least excess
+        is less than t. a stack of the superblocks with increasing
+        minima, from the virtual position -1 of excess 0, gives these
+        for every t at once.
+
+        """
+        mins, supers = self._supermins, self._supers
+        keys, found, prev = [], [], []
+        # the groups of each superblock are keyed by their least depth
+        self._width = width = int(supers.max()) + 2 if len(supers) else 1
+        # superblocks and their least excess, above a virtual one
+        stack = [(-1, -1)]
+        for s in xrange(len(supers)):
+            upper, lowest = int(supers[s]), int(mins[s])
+            groups = []
+            for top, low in reversed(stack):
+                if low < upper and lowest <= upper:
+                    groups.append((s * width + max(low + 1, lowest), top))
+                    upper = low
+                if low < lowest:
+                    break
+            groups.reverse()
+            keys.extend(key for key, _ in groups)
+            found.extend(top for _, top in groups)
+            while stack[-1][1] >= lowest:
+                stack.pop()
+            prev.append(stack[-1][0])
+            stack.append((s, lowest))
+        self._keys = numpy.array(keys, dtype=numpy.int64)
+        self._found = numpy.array(found, dtype=numpy.int32)
+        jumps = [numpy.array(prev, dtype=numpy.int32)]
+        while 1 << len(jumps) <= len(supers):
+            up = jumps[-1]
+            jumps.append(numpy.where(up >= 0, up[numpy.maximum(up, 0)], -1))
+        self._jumps = jumps
+
+    def _fetch(self, w):
+        """return the words w, with the padding of the last set"""
+        return self._words[w] | numpy.where(
+            w == self._last, self._pad, numpy.uint64(0)
+        )
+
+    def _wordstats(self, w):
+        """return the change in excess over the words w and the least
+        excess within them, relative to the excess before them"""
+        halves = self._fetch(w).view('<u2').reshape(w.shape + (4,))
+        delta = DELTA16[halves]
+        mins = (
+            numpy.cumsum(delta, axis=-1) - delta + MINPREFIX16[halves]
+        ).min(axis=-1)
+        return delta.sum(axis=-1, dtype=numpy.int64), mins
+
+    def _blockbefore(self, b):
+        """return the excess before the blocks b"""
+        return (
+            self._supers[b // self.BLOCKS] +
+            self._blocks[b].astype(numpy.int64)
+        )
+
+    def _wordrows(self, b):
+        """return the excess before and the least excess within each
+        word of the blocks b, as rows (INF beyond the last word)"""
+        w = b[:, None] * self.WORDS + numpy.arange(self.WORDS)
+        valid = w <= self._last
+        delta, mins = self._wordstats(numpy.where(valid, w, 0))
+        before = self._blockbefore(b)[:, None] + (
+            numpy.cumsum(delta, axis=1) - delta
+        )
+        mins = mins + before
+        mins[~valid] = self.INF
+        return before, mins
+
+    def _wordbefore(self, w):
+        """return the excess before the words w"""
+        k = w % self.WORDS
+        prior = w[:, None] - k[:, None] + numpy.arange(self.WORDS - 1)
+        ones = popcounts(self._words[numpy.minimum(prior, w[:, None])])
+        ones = ones.reshape(len(w), self.WORDS - 1)
+        ones[numpy.arange(self.WORDS - 1) >= k[:, None]] = 0
+        return self._blockbefore(w // self.WORDS) + (
+            2 * ones.sum(axis=1) - 64 * k
+        )
+
+    def _blockrows(self, s):
+        """return the least excess within each block of the
+        superblocks s, as rows (INF beyond the last block)"""
+        b = s[:, None] * self.BLOCKS + numpy.arange(self.BLOCKS)
+        valid = b < len(self._blocks)
+        b = numpy.where(valid, b, 0)
+        mins = self._blockbefore(b) + self._blockmins[b]
+        mins[~valid] = self.INF
+        return mins
+
+    def _bitrows(self, w, before=None):
+        """return the excess after each bit of the words w, as rows.
+
+        :param before: the excess before the words, if known
+
+        """
+        if before is None:
+            before = self._wordbefore(w)
+        bits = numpy.unpackbits(
+            self._fetch(w).view(numpy.uint8).reshape(-1, 8, 1), axis=2
+        )[:, :, ::-1].reshape(-1, 64)
+        return before[:, None] + numpy.cumsum(
+            2 * bits.astype(numpy.int8) - 1, axis=1, dtype=numpy.int64
+        )
+
+    @staticmethod
+    def _window(rows, lo, hi, fill):
+        """fill the columns of rows outside lo to hi (inclusive)"""
+        cols = numpy.arange(rows.shape[1])
+        rows[(cols < lo[:, None]) | (cols > hi[:, None])] = fill
+        return rows
+
+    def _firstmin(self, rows, lo, hi):
+        """return the least value in columns lo to hi of each row (INF
+        if empty), and its first column"""
+        rows = self._window(rows, lo, hi, self.INF)
+        k = numpy.argmin(rows, axis=1)
+        return rows[numpy.arange(len(rows)), k], k
+
+    def _lastbelow(self, rows, hi, t):
+        """return the last of columns 0 to hi of each row with a value
+        less than t, or -1"""
+        below = self._window(rows < t[:, None], numpy.zeros_like(hi), hi, 0)
+        k = rows.shape[1] - 1 - numpy.argmax(below[:, ::-1], axis=1)
+        return numpy.where(below.any(axis=1), k, -1)
+
+    def _supermin(self, a, b):
+        """return the least excess in superblocks a to b, and the first
+        superblock holding it (INF where b precedes a)"""
+        empty = b < a
+        a, b = numpy.where(empty, 0, a), numpy.where(empty, 0, b)
+        level = numpy.frexp(b - a + 1)[1] - 1
+        left, right = numpy.zeros_like(a), numpy.zeros_like(a)
+        for k in numpy.unique(level):
+            rows = level == k
+            left[rows] = self._table[k][a[rows]]
+            right[rows] = self._table[k][b[rows] - (1 << k) + 1]
+        mins = numpy.minimum(self._supermins[left], self._supermins[right])
+        found = numpy.where(self._supermins[left] <= mins, left, right)
+        return numpy.where(empty, self.INF, mins), found
+
+    def _batches(self, func, *args):
+        """apply func to arrays of queries, a chunk at a time"""
+        args = [numpy.asarray(arg, dtype=numpy.int64) for arg in args]
+        n = len(args[0])
+        if n <= self.CHUNK:
+            return func(*args)
+        parts = [
+            func(*[arg[i:i + self.CHUNK] for arg in args])
+            for i in xrange(0, n, self.CHUNK)
+        ]
+        if isinstance(parts[0], tuple):
+            return tuple(numpy.concatenate(p) for p in zip(*parts))
+        return numpy.concatenate(parts)
+
+    def excess(self, i):
+        """return the excess at each of the positions i"""
+        return self._batches(self._excess, i)
+
+    def _excess(self, i):
+        return self._bitrows(i >> 6)[numpy.arange(len(i)), i & 63]
+
+    def ranks(self, pos):
+        """return the preorder ranks of the nodes at positions pos"""
+        pos = numpy.asarray(pos, dtype=numpy.int64)
+        return (pos + 1 + self.excess(pos)) // 2 - 1
+
+    def minimum(self, i, j):
+        """return the least excess between each pair of positions i
+        and j (inclusive, with i <= j), and its first position"""
+        return self._batches(self._minimum, i, j)
+
+    def _minimum(self, i, j):
+        W, B = self.WORDS, self.BLOCKS  # pylint: disable=C0103
+        wi, wj = i >> 6, j >> 6
+        bi, bj = wi // W, wj // W
+        si, sj = bi // B, bj // B
+        last, every = numpy.full(len(i), 63), numpy.arange(len(i))
+        ibefore, imins = self._wordrows(bi)
+        jbefore, jmins = self._wordrows(bj)
+        best, k = self._firstmin(
+            self._bitrows(wi, ibefore[every, wi % W]), i & 63,
+            numpy.where(wi == wj, j & 63, last),
+        )
+        # the candidates from left to right, as (kind, index) where
+        # kind is 0 for positions, 1 for words, 2 for blocks and 3 for
+        # superblocks; the first strictly smaller one wins
+        kind, index = numpy.zeros_like(i), 64 * wi + k
+
+        def update(found, k, idx):
+            better = found < best
+            best[better] = found[better]
+            kind[better], index[better] = k, idx[better]
+
+        found, k = self._firstmin(
+            imins, wi % W + 1, numpy.where(bi == bj, wj % W - 1, W - 1)
+        )
+        update(found, 1, bi * W + k)
+        found, k = self._firstmin(
+            self._blockrows(si), bi % B + 1,
+            numpy.where(si == sj, bj % B - 1, B - 1),
+        )
+        update(found, 2, si * B + k)
+        found, s = self._supermin(si + 1, sj - 1)
+        update(found, 3, s)
+        found, k = self._firstmin(
+            self._blockrows(sj), numpy.where(sj > si, 0, B), bj % B - 1
+        )
+        update(found, 2, sj * B + k)
+        found, k = self._firstmin(
+            jmins, numpy.where(bj > bi, 0, W), wj % W - 1
+        )
+        update(found, 1, bj * W + k)
+        found, k = self._firstmin(
+            self._bitrows(wj, jbefore[every, wj % W]),
+            numpy.where(wj > wi, 0, 64), j & 63,
+        )
+        update(found, 0, 64 * wj + k)
+
+        # descend from the winning superblock, block or word
+        zeros = numpy.zeros(len(i), dtype=numpy.int64)
+        rows = kind == 3
+        _, k = self._firstmin(
+            self._blockrows(index[rows]), zeros[rows], last[rows]
+        )
+        kind[rows], index[rows] = 2, index[rows] * B + k
+        rows = kind == 2
+        before, mins = self._wordrows(index[rows])
+        _, k = self._firstmin(mins, zeros[rows], last[rows])
+        kind[rows], index[rows] = 1, index[rows] * W + k
+        wbefore = numpy.zeros(len(i), dtype=numpy.int64)
+        wbefore[rows] = before[numpy.arange(len(k)), k]
+        found = (kind == 1) & ~rows  # words not reached from a block
+        wbefore[found] = self._wordbefore(index[found])
+        rows = kind == 1
+        _, k = self._firstmin(
+            self._bitrows(index[rows], wbefore[rows]), zeros[rows],
+            last[rows],
+        )
+        index[rows] = 64 * index[rows] + k
+        return best, index
+
+    def lca(self, a, b):
+        """return the lowest common ancestors of pairs of nodes.
+
+        unless the first node of a pair is an ancestor of the second,
+        the first least excess between them is where a child of their
+        lowest common ancestor closes, and the node opening right after
+        it is another child, whose parent is the ancestor.
+
+        :param a: the positions of the first node of each pair
+        :param b: the positions of the second node of each pair
+        :returns: the positions of the ancestors
+
+        """
+        a = numpy.asarray(a, dtype=numpy.int64)
+        b = numpy.asarray(b, dtype=numpy.int64)
+        lo, hi = numpy.minimum(a, b), numpy.maximum(a, b)
+        depth, pos = self.minimum(lo, hi)
+        child = numpy.where(pos == lo, 1, pos + 1)
+        return numpy.where(pos == lo, lo, self.before(child, depth) + 1)
+
+    def ancestor(self, pos, d):
+        """return the ancestors d levels up of nodes, or -1 where there
+        is none.
+
+        :param pos: the positions of the nodes
+        :param d: the number of levels up, for all or each node
+        :returns: the positions of the ancestors
+
+        """
+        pos = numpy.asarray(pos, dtype=numpy.int64)
+        depth = self.excess(pos)
+        d = numpy.broadcast_to(d, depth.shape).astype(numpy.int64)
+        found = self.before(pos, depth - d) + 1
+        found[(d < 0) | (d >= depth)] = -1
+        return found
+
+    def before(self, i, t):
+        """return the last position before each position i whose
+        excess is less than t, or -1"""
+        return self._batches(self._beforesearch, i, t)
+
+    def _scan(self, p, t):
+        """return the last position at or before each position p, and
+        in the same superblock, whose excess is less than t, or -1"""
+        W, B = self.WORDS, self.BLOCKS  # pylint: disable=C0103
+        w = p >> 6
+        b = w // W
+        before, mins = self._wordrows(b)
+        every = numpy.arange(len(p))
+        found = self._lastbelow(
+            self._bitrows(w, before[every, w % W]), p & 63, t
+        )
+        pos = numpy.where(found >= 0, 64 * w + found, -1)
+        k = self._lastbelow(mins, w % W - 1, t)
+        word = numpy.where(k >= 0, b * W + k, -1)
+        wbefore = before[every, numpy.maximum(k, 0)]
+        block = self._lastbelow(self._blockrows(b // B), b % B - 1, t)
+
+        # descend from the last block or word holding a smaller excess
+        last = numpy.full(len(p), W - 1)
+        rows = (word < 0) & (block >= 0)
+        block = b[rows] // B * B + block[rows]
+        before, mins = self._wordrows(block)
+        k = self._lastbelow(mins, last[rows], t[rows])
+        word[rows] = block * W + k
+        wbefore[rows] = before[numpy.arange(len(k)), k]
+        rows = (pos < 0) & (word >= 0)
+        pos[rows] = 64 * word[rows] + self._lastbelow(
+            self._bitrows(word[rows], wbefore[rows]),
+            numpy.full(rows.sum(), 63), t[rows],
+        )
+        return pos
+
+    def _beforesearch(self, i, t):
+        nsuper = 64 * self.WORDS * self.BLOCKS
+        p = numpy.maximum(i - 1, 0)
+        pos = self._scan(p, t)
+        s = p // nsuper
+        todo = (pos < 0) & (i > 0)
+
+        # the superblock holding the answer: the one before, one found
+        # among the pioneers, or one up the chain of smaller minima
+        found = numpy.full(len(i), -1, dtype=numpy.int64)
+        rows = todo & (t > self._supers[s])
+        found[rows] = s[rows] - 1
+        rows = todo & ~rows & (t >= self._supermins[s])
+        k = numpy.searchsorted(
+            self._keys, s[rows] * self._width + t[rows], side='right'
+        ) - 1
+        found[rows] = self._found[k]
+        rows = todo & (t < self._supermins[s]) & (t > 0)
+        cur, tr = s[rows], t[rows]
+        for jump in reversed(self._jumps):
+            up = jump[cur]
+            climb = (up >= 0) & (
+                self._supermins[numpy.maximum(up, 0)] >= tr
+            )
+            cur = numpy.where(climb, up, cur)
+        found[rows] = self._jumps[0][cur] if len(self._jumps) else -1
+
+        rows = todo & (found >= 0)
+        pos[rows] = self._scan((found[rows] + 1) * nsuper - 1, t[rows])
+        return numpy.where(i > 0, pos, -1)
+
+class NumpyEliasFano(encoding.EliasFano):
+    """an EliasFano built and decoded by numpy"""
+
+    def __init__(self, data, backend=None):  # pylint: disable=W0231
+        # the values are encoded CHUNK at a time, so that a bit vector
+        # is never unpacked whole
+        if isinstance(data, bitvector.PackedBitVector):
+            universe = len(data)
+            n = countones(vector(data.words), universe)
+            values = onechunks(vector(data.words), universe)
+        elif isinstance(data, bitvector.BitVector):
+            universe = len(data)
+            values = numpy.flatnonzero(
+                numpy.frombuffer(str(data), dtype=numpy.uint8) == ord('1')
+            )
+            n, values = len(values), [values]
+        else:
+            if not isinstance(data, numpy.ndarray):
+                data = list(data)
+            values = numpy.asarray(data, dtype=numpy.int64)
+            universe = int(values[-1]) + 1 if len(values) else 0
+            n, values = len(values), [values]
+
+        width = encoding._width(n, universe)  # pylint: disable=W0212
+        lows = array.array(bitvector.WORDTYPE)
+        highs = numpy.zeros(
+            -(-(((universe - 1) >> width) + n) // 64) if n else 0,
+            dtype=WORD,
+        )
+        shifts = numpy.arange(width, dtype=numpy.int64)
+        done, prev = 0, 0
+        # a chunk holds a multiple of 64 values, so its packed low bits
+        # fill whole words
+        for chunk in regroup(values, CHUNK):
+            chunk = chunk.astype(numpy.int64)
+            if chunk[0] < prev or (numpy.diff(chunk) < 0).any():
+                raise ValueError('values must be non-negative and sorted')
+            prev = int(chunk[-1])
+            if width:
+                lows.extend(pack(((chunk[:, None] >> shifts) & 1).ravel()))
+            orbits(highs, (chunk >> width) + numpy.arange(
+                done, done + len(chunk)
+            ))
+            done += len(chunk)
+        nbits = (prev >> width) + n if n else 0
+
+        self._len = n
+        self._width = width
+        self._lows = lows
+        self._highs = NumpyBitVector.fromwords(
+            toarray(bitvector.WORDTYPE, highs[:-(-nbits // 64)]), nbits
+        )
+        self._highs.rankdirectory()
+
+    def decode(self, start=0, stop=None):
+        return toarray(bitvector.WORDTYPE, self._decode(start, stop))
+
+    def _decode(self, start, stop):
+        """return values start ... stop - 1 as a numpy int64 array"""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        if start >= stop:
+            return numpy.zeros(0, dtype=numpy.int64)
+        first = self._highs.select('1', start + 1)
+        last = self._highs.select('1', stop)
+        words = vector(self._highs.words)[first // 64:last // 64 + 1]
+        positions = numpy.flatnonzero(unpack(words)) + first // 64 * 64
+        positions = positions[positions >= first][:stop - start]
+        idx = numpy.arange(start, stop, dtype=numpy.int64)
+        highs = positions - idx
+        if not self._width:
+            return highs
+        bit = idx * self._width
+        w, off = bit >> 6, (bit & 63).astype(WORD)
+        # only copy the words covering the slice, plus one for spills
+        lows = vector(self._lows)[w[0]:w[-1] + 2]
+        lows = numpy.append(lows, numpy.zeros(1, dtype=WORD))
+        w = w - w[0]
+        low = lows[w] >> off
+        spill = (off + numpy.uint64(self._width)) > numpy.uint64(64)
+        low[spill] |= lows[w[spill] + 1] << (numpy.uint64(64) - off[spill])
+        low &= numpy.uint64((1 << self._width) - 1)
+        return (highs << self._width) | low.astype(numpy.int64)
+
+def codes(src):
+    """return the character codes of a (byte or unicode) string"""
+    if isinstance(src, unicode):
+        return numpy.frombuffer(src.encode('utf-32-le'), dtype='<u4')
+    return numpy.frombuffer(src, dtype=numpy.uint8)
+
+def scanchunk(chars, instring=False, escaped=False):
+    """find the structural characters in a chunk of json text.
+
+    a character is escaped if it follows an odd number of
+    backslashes, and is inside a string if it follows an odd number
+    of unescaped quotes. only the (typically sparse) positions of
+    backslashes, quotes and structural characters are examined.
+
+    :param chars: the character codes of the chunk
+    :param bool instring: whether the chunk starts inside a string
+    :param bool escaped: whether its first character is escaped
+    :returns: the positions of the structural characters in the
+    chunk, and whether the next chunk starts inside a string and
+    escaped
+
+    """
+    n = len(chars)
+    if chars.dtype != numpy.uint8:
+        chars = numpy.minimum(chars, 255)
+    candidates = numpy.flatnonzero(SYMBOLS[chars])
+    special = chars[candidates]
+
+    # find the runs of backslashes and the characters they escape
+    slashes = candidates[special == ord('\\')]
+    escapes = numpy.zeros(0, dtype=numpy.int64)
+    if len(slashes):
+        starts = numpy.r_[True, slashes[1:] != slashes[:-1] + 1]
+        lengths = numpy.bincount(numpy.cumsum(starts) - 1)
+        ends = slashes[starts] + lengths
+        if escaped and slashes[0] == 0:
+            lengths[0] += 1
+        escapes = ends[lengths & 1 == 1]
+        escaped_out = bool(ends[-1] == n and lengths[-1] & 1)
+    else:
+        escaped_out = bool(escaped and not n)
+    if escaped and n and chars[0] != ord('\\'):
+        escapes = numpy.r_[0, escapes]
+
+    # count the unescaped quotes up to each candidate
+    quotes = special == ord('"')
+    escapes = escapes[escapes < n]
+    if len(escapes) and len(candidates):
+        idx = numpy.minimum(
+            numpy.searchsorted(candidates, escapes), len(candidates) - 1
+        )
+        quotes[idx[candidates[idx] == escapes]] = False
+    count = numpy.cumsum(quotes) + instring
+    structural = ~quotes & (count & 1 == 0) & (special != ord('\\'))
+    return (
+        candidates[structural],
+        bool(count[-1] & 1) if len(count) else instring,
+        escaped_out,
+    )
+
+def parentheses(chars):
+    """return the balanced parentheses bits of structural characters.
+
+    :param chars: the codes of the structural characters, in order
+    :returns: the bits, as a NumpyBitVector, the nesting depth after
+    each character, and a mask of the colons and commas
+
+    """
+    opening = (chars == ord('[')) | (chars == ord('{'))
+    closing = (chars == ord(']')) | (chars == ord('}'))
+    depth = numpy.cumsum(opening.astype(numpy.int64) - closing)
+    bits = numpy.empty(2 * len(chars), dtype=numpy.uint8)
+    bits[0::2] = opening
+    bits[1::2] = ~closing
+    bv = NumpyBitVector.fromwords(pack(bits), len(bits))
+    return bv, depth, ~opening & ~closing
+
+def _summarize(chars, instring=False, escaped=False):
+    """scan the character codes of a chunk of json text.
+
+    :returns: the Chunk, whether the text following it starts inside
+    a string, and whether its first character is escaped
+
+    """
+    positions, instring, escaped = scanchunk(chars, instring, escaped)
+    bv, depth, separators = parentheses(chars[positions])
+    depth = numpy.append(0, depth)
+    chunk = scanner.Chunk(
+        bv,
+        NumpyBitVector.fromwords(setbits(positions, len(chars)), len(chars)),
+        int(depth[-1]),
+        int(depth.min()),
+        int(numpy.append(sys.maxint, depth[1:][separators]).min()),
+    )
+    return chunk, instring, escaped
+
+def summarize(src, instring=False, escaped=False):
+    """scan a chunk of json text, as scanner.summarize"""
+    chunk, instring, _ = _summarize(codes(src), instring, escaped)
+    return chunk, instring
+
+def scan(src, builder=None, processes=None):
+    """scan json text, as scanner.scan.
+
+    the text is processed a chunk at a time, but each chunk is scanned
+    with vectorized operations: escaped characters are found from the
+    lengths of runs of backslashes, string regions from the parity of
+    a prefix sum over unescaped quotes, and the nesting depth from a
+    prefix sum over opening and closing characters. the bits of each
+    chunk are packed as soon as it is scanned, so the positions of
+    only one chunk are held at a time.
+
+    :param builder: the class of bit vector builder to use, by
+    default NumpyBitVectorBuilder
+    :returns: the balanced parentheses bits and structural positions,
+    as bit vectors
+
+    """
+    builder = builder or NumpyBitVectorBuilder
+    if processes is not None and len(src) > scanner.CHUNKSIZE:
+        return scanner.parallel(src, summarize, builder, processes)
+    chars, state = codes(src), {'instring': False}
+
+    def chunks():
+        instring = escaped = False
+        for start in xrange(0, len(chars), SCANCHUNK):
+            chunk, instring, escaped = _summarize(
+                chars[start:start + SCANCHUNK], instring, escaped
+            )
+            yield chunk
+        state['instring'] = instring
+
+    bv, pos = scanner.join(chunks(), builder)
+    if state['instring']:
+        raise ValueError('malformed json')
+    return bv, pos
@@ -0,0 +1,59 @@
+import os
+import unittest
+
+from succinct import (
+    backends,
+    bitvector,
+    encoding,
+)
+
+class BackendTests(unittest.TestCase):
+
+    def setUp(self):
+        self.environ = os.environ.pop(backends.ENVIRONMENT, None)
+
+    def tearDown(self):
+        os.environ.pop(backends.ENVIRONMENT, None)
+        if self.environ is not None:
+            os.environ[backends.ENVIRONMENT] = self.environ
+
+    def test_python(self):
+        be = backends.get('python')
+        self.assertEqual(be.name, 'python')
+        self.assertIs(be.bitvector, bitvector.PackedBitVector)
+        self.assertIs(be.parentheses, encoding.RangeMinMaxParentheses)
+        self.assertIs(be.eliasfano, encoding.EliasFano)
+        self.assertIs(backends.get(be), be)
+        self.assertIn('python', backends.available())
+
+    def test_default(self):
+        self.assertIn(backends.get().name, backends.DEFAULTS)
+        self.assertIn(backends.get().name, backends.available())
+
+    def test_environment(self):
+        os.environ[backends.ENVIRONMENT] = 'python'
+        self.assertEqual(backends.get().name, 'python')
+        self.assertEqual(backends.get('python').name, 'python')
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, backends.get, 'nonexistent')
+        os.environ[backends.ENVIRONMENT] = 'nonexistent'
+        self.assertRaises(ValueError, backends.get)
+
+    def test_register(self):
+        def missing():
+            raise ImportError('missing')
+
+        def custom():
+            return backends.get('python')._replace(name='custom')
+
+        try:
+            backends.register('missing', missing)
+            backends.register('custom', custom)
+            self.assertNotIn('missing', backends.available())
+            self.assertRaises(ImportError, backends.get, 'missing')
+            self.assertEqual(backends.get('custom').name, 'custom')
+        finally:
+            backends._LOADERS.pop('missing', None)
+            backends._LOADERS.pop('custom', None)
+            backends._BACKENDS.pop('custom', None)
@@ -1,7 +1,13 @@
+import random
 import unittest
 
 from succinct import bitvector
 
+try:
+    from succinct import vectorized
+except ImportError:
+    vectorized = None
+
 class BitVector(bitvector.BitVector):
 
     def __init__(self, bits):
@@ -113,3 +119,143 @@ class TestBitVectorTests(BitVectorTestCases.BitVectorTests):
 
     def construct(self, bits):
         return BitVector(bits)
+
+class TestPackedBitVectorTests(BitVectorTestCases.BitVectorTests):
+
+    def construct(self, bits):
+        return bitvector.PackedBitVector(bits)
+
+    def test_reference(self):
+        rnd = random.Random(0)
+        bits = ''.join(rnd.choice('01') for _ in range(10000))
+        bv, ref = self.construct(bits), BitVector(bits)
+
+        self.assertEqual(str(bv), bits)
+        self.assertEqual(bv[4090:4200], bits[4090:4200])
+        for i in range(0, len(bits), 7):
+            self.assertEqual(bv[i], bits[i])
+            for p in ('0', '1'):
+                self.assertEqual(bv.rank(p, i), bits[:i + 1].count(p))
+        for k in range(1, 1000, 13):
+            for p in ('0', '1', '10', '01'):
+                self.assertEqual(bv.select(p, k), ref.select(p, k))
+
+    def test_append(self):
+        bv, bits = self.construct(''), ''
+        for bit in '1101' * 50:
+            bv.append(bit)
+            bits += bit
+            self.assertEqual(bv.rank('1', len(bv) - 1), bits.count('1'))
+        bv.extend('0' * 100)
+        self.assertEqual(str(bv), bits + '0' * 100)
+
+    def test_select_density(self):
+        rnd = random.Random(1)
+        for density in (0.001, 0.5, 0.999):
+            bits = ''.join(
+                '1' if rnd.random() < density else '0'
+                for _ in range(20000)
+            )
+            bv = self.construct(bits)
+            for p in ('0', '1'):
+                pos = [idx for idx, b in enumerate(bits) if b == p]
+                for k in range(1, len(pos) + 1, 1 + len(pos) / 500):
+                    self.assertEqual(bv.select(p, k), pos[k - 1])
+                with self.assertRaises(ValueError):
+                    bv.select(p, len(pos) + 1)
+
+    def test_select64(self):
+        rnd = random.Random(2)
+        for _ in range(1000):
+            w = rnd.getrandbits(64)
+            pos = [j for j in range(64) if w >> j & 1]
+            for r, j in enumerate(pos):
+                self.assertEqual(bitvector.select64(w, r), j)
+
+    def test_patterns(self):
+        rnd = random.Random(3)
+        for n in (1, 2, 64, 65, 128, 5000):
+            bits = ''.join(rnd.choice('01') for _ in range(n))
+            bv = self.construct(bits)
+            for p in ('10', '01'):
+                pos = [i for i in range(n) if bits[i:i + 2] == p]
+                for i in range(n):
+                    self.assertEqual(
+                        bv.rank(p, i),
+                        sum(1 for j in pos if j <= i)
+                    )
+                for k, j in enumerate(pos, 1):
+                    self.assertEqual(bv.select(p, k), j)
+                with self.assertRaises(ValueError):
+                    bv.select(p, len(pos) + 1)
+
+class TestBitVectorBuilderTests(BitVectorTestCases.BitVectorTests):
+
+    BUILDER = bitvector.BitVectorBuilder
+
+    def construct(self, bits):
+        builder = self.BUILDER()
+        builder.extend(bits)
+        return builder.freeze()
+
+    def test_build(self):
+        rnd = random.Random(4)
+        builder, bits = self.BUILDER(), ''
+        for _ in range(2000):
+            op = rnd.randrange(4)
+            if op == 0:
+                bit = rnd.choice('01')
+                builder.append(bit)
+                bits += bit
+            elif op == 1:
+                bit, n = rnd.choice('01'), rnd.randrange(200)
+                builder.appendrun(bit, n)
+                bits += bit * n
+            elif op == 2:
+                n = rnd.randrange(65)
+                w = rnd.getrandbits(64)
+                builder.appendword(w, n)
+                bits += ''.join(str(w >> j & 1) for j in range(n))
+            else:
+                chunk = ''.join(
+                    rnd.choice('01') for _ in range(rnd.randrange(300))
+                )
+                bv = bitvector.PackedBitVector(chunk)
+                builder.appendwords(bv.words, len(bv))
+                bits += chunk
+            self.assertEqual(len(builder), len(bits))
+        bv = builder.freeze()
+        self.assertEqual(str(bv), bits)
+        self.assertEqual(len(builder), 0)
+        for i in range(0, len(bits), 101):
+            self.assertEqual(bv.rank('1', i), bits[:i + 1].count('1'))
+
+@unittest.skipUnless(vectorized, 'numpy is not installed')
+class TestNumpyBitVectorTests(TestPackedBitVectorTests):
+
+    def construct(self, bits):
+        return vectorized.NumpyBitVector(bits)
+
+    def test_indexes(self):
+        rnd = random.Random(5)
+        for n in (0, 1, 63, 64, 65, 5000, 70000):
+            bits = ''.join(rnd.choice('01') for _ in range(n))
+            bv = self.construct(bits)
+            ref = bitvector.PackedBitVector(bits)
+            for p in ('1', '10', '01'):
+                idx, expected = bv._index(p), ref._index(p)
+                self.assertEqual(idx.supers, expected.supers)
+                self.assertEqual(idx.blocks, expected.blocks)
+                self.assertEqual(idx.samples, expected.samples)
+            self.assertIs(bv.rankdirectory(), bv._index('1'))
+            self.assertEqual(list(bv.ones()), list(ref.ones()))
+
+@unittest.skipUnless(vectorized, 'numpy is not installed')
+class TestNumpyBitVectorBuilderTests(TestBitVectorBuilderTests):
+
+    BUILDER = vectorized and vectorized.NumpyBitVectorBuilder
+
+    def construct(self, bits):
+        bv = super(TestNumpyBitVectorBuilderTests, self).construct(bits)
+        self.assertIsInstance(bv, vectorized.NumpyBitVector)
+        return bv
@@ -1,6 +1,14 @@
+import array
+import random
 import unittest
 
 from succinct import encoding
+from succinct.bitvector import PackedBitVector
+
+try:
+    from succinct import vectorized
+except ImportError:
+    vectorized = None
 
 from test import bitvector
 
@@ -86,6 +94,16 @@ class BalancedParentheses(encoding.BalancedParentheses):
                     return x
         raise ValueError('range has no minrank {}'.format(k))
 
+def randbp(rnd, n):
+    """return a random balanced parentheses sequence with n nodes"""
+    seq, depth = '', 0
+    while n or depth:
+        if n and (not depth or rnd.random() < 0.5):
+            seq, depth, n = seq + '(', depth + 1, n - 1
+        else:
+            seq, depth = seq + ')', depth - 1
+    return seq
+
 class BPTestCases(object):
 
     class BPTests(unittest.TestCase):
@@ -284,3 +302,243 @@ class TestBPTests(BPTestCases.BPTests):
                 encoding.tobits(sequence)
             )
         )
+
+class TestPackedBPTests(BPTestCases.BPTests):
+
+    def construct(self, sequence):
+        return BalancedParentheses(
+            PackedBitVector(
+                encoding.tobits(sequence)
+            )
+        )
+
+    def test_balanced(self):
+        rnd = random.Random(6)
+        seq = randbp(rnd, 500)
+        self.construct(seq)
+        for i in range(1, len(seq), 7):
+            # rotations are balanced iff they split at excess zero
+            if seq[:i].count('(') * 2 == i:
+                continue
+            with self.assertRaises(ValueError):
+                self.construct(seq[i:] + seq[:i])
+
+    def test_trusted(self):
+        bv = PackedBitVector(encoding.tobits(')('))
+        with self.assertRaises(ValueError):
+            BalancedParentheses(bv)
+        self.assertEqual(len(BalancedParentheses(bv, trusted=True)), 2)
+
+class TestRangeMinMaxTests(BPTestCases.BPTests):
+
+    def construct(self, sequence):
+        return encoding.RangeMinMaxParentheses(
+            PackedBitVector(
+                encoding.tobits(sequence)
+            )
+        )
+
+class TestSmallBlockRangeMinMaxTests(BPTestCases.BPTests):
+
+    def construct(self, sequence, block=3):
+        cls = type(
+            'RangeMinMaxParentheses',
+            (encoding.RangeMinMaxParentheses,),
+            {'BLOCK': block},
+        )
+        return cls(PackedBitVector(encoding.tobits(sequence)))
+
+    def test_reference(self):
+        rnd = random.Random(5)
+        for block in (3, 8, 24):
+            seq = randbp(rnd, 100)
+            enc = self.construct(seq, block)
+            ref = BalancedParentheses(
+                PackedBitVector(encoding.tobits(seq))
+            )
+            for _ in range(200):
+                i, d = rnd.randrange(-1, len(seq) - 1), rnd.randrange(-3, 3)
+                try:
+                    self.assertEqual(enc.fwdsearch(i, d), ref.fwdsearch(i, d))
+                except ValueError:
+                    self.assertRaises(ValueError, ref.fwdsearch, i, d)
+                i = rnd.randrange(len(seq) + 1)
+                try:
+                    self.assertEqual(enc.bwdsearch(i, d), ref.bwdsearch(i, d))
+                except ValueError:
+                    self.assertRaises(ValueError, ref.bwdsearch, i, d)
+                i = rnd.randrange(len(seq))
+                j = rnd.randrange(i, len(seq))
+                for op in ('firstmin', 'firstmax', 'countmin'):
+                    self.assertEqual(
+                        getattr(enc, op)(i, j),
+                        getattr(ref, op)(i, j)
+                    )
+                k = rnd.randrange(1, ref.countmin(i, j) + 1)
+                self.assertEqual(
+                    enc.selectmin(i, j, k),
+                    ref.selectmin(i, j, k)
+                )
+
+class EliasFanoTestCases(object):
+
+    class EliasFanoTests(unittest.TestCase):
+
+        def construct(self, data):
+            raise NotImplementedError()
+
+        def check(self, ef, values):
+            self.assertEqual(len(ef), len(values))
+            self.assertEqual(list(ef), values)
+            self.assertEqual(ef[1:-1], values[1:-1])
+            if values:
+                self.assertEqual(ef[-1], values[-1])
+            with self.assertRaises(IndexError):
+                ef[len(values)]
+
+        def test_sequence(self):
+            rnd = random.Random(7)
+            cases = ((0, 0), (1, 1), (100, 100000), (1000, 3000))
+            for n, universe in cases:
+                values = sorted(rnd.randrange(universe) for _ in range(n))
+                self.check(self.construct(values), values)
+
+        def test_bitvector(self):
+            rnd = random.Random(8)
+            bits = ''.join(rnd.choice('0001') for _ in range(5000))
+            values = [idx for idx, bit in enumerate(bits) if bit == '1']
+            self.check(self.construct(bitvector.BitVector(bits)), values)
+            self.check(self.construct(PackedBitVector(bits)), values)
+
+        def test_decode(self):
+            rnd = random.Random(10)
+            values = sorted(rnd.randrange(5000) for _ in range(700))
+            ef = self.construct(values)
+            for k in (0, 1, 350, 699, 700):
+                self.assertEqual(list(ef.iter_from(k)), values[k:])
+            self.assertEqual(list(ef.decode()), values)
+            self.assertIsInstance(ef.decode(), array.array)
+            self.assertEqual(
+                ef.decode().typecode, encoding.bitvector.WORDTYPE
+            )
+            self.assertEqual(list(ef.decode(10, 500)), values[10:500])
+            self.assertEqual(list(ef.decode(-5)), values[-5:])
+            self.assertEqual(list(ef.decode(500, 10)), [])
+            with self.assertRaises(IndexError):
+                next(ef.iter_from(701))
+
+        def test_unsorted(self):
+            with self.assertRaises(ValueError):
+                self.construct([1, 0])
+            with self.assertRaises(ValueError):
+                self.construct([-1])
+
+        def test_successor(self):
+            rnd = random.Random(9)
+            for n, universe in ((1, 1), (50, 60), (100, 100000), (500, 1000)):
+                values = sorted(rnd.randrange(universe) for _ in range(n))
+                ef = self.construct(values)
+                for x in range(-1, universe + 2, 1 + universe / 300):
+                    geq = [i for i, v in enumerate(values) if v >= x]
+                    if geq:
+                        self.assertEqual(ef.next_geq(x), geq[0])
+                    else:
+                        self.assertRaises(ValueError, ef.next_geq, x)
+                    leq = [i for i, v in enumerate(values) if v <= x]
+                    if leq:
+                        self.assertEqual(ef.prev_leq(x), leq[-1])
+                    else:
+                        self.assertRaises(ValueError, ef.prev_leq, x)
+
+class TestEliasFanoTests(EliasFanoTestCases.EliasFanoTests):
+
+    def construct(self, data):
+        return encoding.EliasFano(data)
+
+class TestPartitionedEliasFanoTests(EliasFanoTestCases.EliasFanoTests):
+
+    class PartitionedEliasFano(encoding.PartitionedEliasFano):
+        CHUNK = 16
+
+    def construct(self, data):
+        return self.PartitionedEliasFano(data)
+
+    def test_clustered(self):
+        rnd, values = random.Random(11), []
+        while len(values) < 2000:
+            start = (values[-1] if values else 0) + rnd.randrange(1000)
+            kind = rnd.randrange(3)
+            if kind == 0:
+                values.extend(range(start, start + 50))
+            elif kind == 1:
+                values.extend(sorted(set(
+                    rnd.randrange(start, start + 100) for _ in range(60)
+                )))
+            else:
+                values.extend(sorted(
+                    rnd.randrange(start, start + 5000) for _ in range(40)
+                ))
+        pef = self.construct(values)
+        self.assertEqual(set(pef._kinds), set(range(3)))
+        self.check(pef, values)
+        for x in range(0, values[-1] + 2, 1 + values[-1] / 1000):
+            idx = pef._lowerbound(x)
+            self.assertTrue(idx == len(values) or values[idx] >= x)
+            self.assertTrue(idx == 0 or values[idx - 1] < x)
+        for k in (0, 15, 16, 17, 1999):
+            self.assertEqual(list(pef.iter_from(k)), values[k:])
+
+@unittest.skipUnless(vectorized, 'numpy is not installed')
+class TestNumpyRangeMinMaxTests(TestSmallBlockRangeMinMaxTests):
+
+    def construct(self, sequence, block=3):
+        cls = type(
+            'NumpyRangeMinMaxParentheses',
+            (vectorized.NumpyRangeMinMaxParentheses,),
+            {'BLOCK': block},
+        )
+        return cls(vectorized.NumpyBitVector(encoding.tobits(sequence)))
+
+    def test_build(self):
+        rnd = random.Random(12)
+        for n in (1, 2, 10, 300, 5000):
+            bits = encoding.tobits(randbp(rnd, n))
+            enc = vectorized.NumpyRangeMinMaxParentheses(
+                vectorized.NumpyBitVector(bits)
+            )
+            ref = encoding.RangeMinMaxParentheses(PackedBitVector(bits))
+            self.assertEqual(enc._mins, ref._mins)
+            self.assertEqual(enc._maxs, ref._maxs)
+            self.assertEqual(enc._nmins, ref._nmins)
+
+@unittest.skipUnless(vectorized, 'numpy is not installed')
+class TestNumpyEliasFanoTests(EliasFanoTestCases.EliasFanoTests):
+
+    def construct(self, data):
+        return vectorized.NumpyEliasFano(data)
+
+    def test_build(self):
+        rnd = random.Random(13)
+        for n in (0, 1, 64, 1000):
+            values = sorted(rnd.randrange(10 * n + 1) for _ in range(n))
+            ef = self.construct(values)
+            ref = encoding.EliasFano(values, 'python')
+            self.assertEqual(ef._lows, ref._lows)
+            self.assertEqual(ef._highs.words, ref._highs.words)
+
+    def test_chunks(self):
+        rnd = random.Random(14)
+        bits = ''.join(rnd.choice('0001') for _ in range(20000))
+        values = [idx for idx, bit in enumerate(bits) if bit == '1']
+        chunk, vectorized.CHUNK = vectorized.CHUNK, 64
+        try:
+            for data in (values, PackedBitVector(bits)):
+                ef = self.construct(data)
+                ref = encoding.EliasFano(values, 'python')
+                self.assertEqual(ef._lows, ref._lows)
+                self.assertEqual(ef._highs.words, ref._highs.words)
+                self.check(ef, values)
+            with self.assertRaises(ValueError):
+                self.construct(values[:64] + values[:64])
+        finally:
+            vectorized.CHUNK = chunk
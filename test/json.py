@@ -1,15 +1,28 @@
 from __future__ import absolute_import
 
+import os
+import shutil
+import tempfile
 import unittest
 import json as pyjson
 
-from succinct import json
+from succinct import (
+    json,
+    backends,
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 class JSONTests(unittest.TestCase):
 
+    BACKEND = 'python'
+
     def check(self, jq, obj, res):
         self.assertEqual(
-            list(json.query(pyjson.dumps(obj), jq)),
+            list(json.query(pyjson.dumps(obj), jq, self.BACKEND)),
             res
         )
 
@@ -227,3 +240,159 @@ class JSONTests(unittest.TestCase):
             {'foo': 'bar', 'bar': 'foo'},
             ['bar', 'foo'],
         )
+
+    def test_escapes(self):
+        self.check(
+            '.[]',
+            ['a"b', 'c\\', '\\"[', '{:}', 'd\\\\'],
+            ['a"b', 'c\\', '\\"[', '{:}', 'd\\\\'],
+        )
+        self.check(
+            '.foo | .[1]',
+            {'foo': ['\\', ',]'], 'bar': '"'},
+            [',]'],
+        )
+
+    def test_list(self):
+        obj = list(range(20)) + [[20], {'a': 21}]
+        node = json.loads(pyjson.dumps(obj), self.BACKEND)
+        self.assertEqual([n.value() for n in node], obj)
+        self.assertEqual([node[i].value() for i in range(22)], obj)
+        for zlice in [
+                slice(None), slice(3, None), slice(-5, -1), slice(2, 19, 3),
+                slice(None, None, -2), slice(10, 2), slice(30, 40),
+        ]:
+            self.assertEqual([n.value() for n in node[zlice]], obj[zlice])
+
+    def test_render(self):
+        doc = json.Document('[[1], {"a": [2]}, 3]', self.BACKEND)
+        for n, obj in zip(doc.nav.root().children(), [[1], {'a': [2]}, 3]):
+            pos = n.pos
+            self.assertEqual(doc.render(n).value(), obj)
+            # the caller's node is not moved
+            self.assertEqual(n.pos, pos)
+
+    def test_keys(self):
+        doc = json.Document(
+            '{"a": {"x": 1}, "b": 2, "a": 3, "c": {"y": [4]}}', self.BACKEND
+        )
+        obj = doc.root()
+        a, c = obj['a'], obj['c']
+        self.assertEqual(a['x'].value(), 1)
+        self.assertEqual(obj['b'].value(), 2)
+        self.assertRaises(KeyError, obj.__getitem__, 'd')
+        self.assertEqual(list(doc._keys), [a.node.pos, obj.node.pos])
+        self.assertEqual(doc._nkeys, 4)
+
+        # evicts the least recently used indexes
+        doc.KEYS = 3
+        self.assertEqual(c['y'].value(), [4])
+        self.assertEqual(list(doc._keys), [c.node.pos])
+        self.assertEqual(obj['b'].value(), 2)
+        self.assertEqual(list(doc._keys), [obj.node.pos])
+
+        # objects with more than KEYS keys are walked, not indexed
+        doc = json.Document(doc._src, self.BACKEND)
+        doc.KEYS = 2
+        obj = doc.root()
+        c = obj['c']
+        self.assertEqual(obj['a'].value(), {'x': 1})
+        self.assertEqual(obj['b'].value(), 2)
+        self.assertRaises(KeyError, obj.__getitem__, 'd')
+        self.assertEqual(doc._keys, {obj.node.pos: None})
+        self.assertEqual(doc._nkeys, 1)
+        self.assertEqual(c['y'].value(), [4])
+        self.assertEqual(list(doc._keys), [obj.node.pos, c.node.pos])
+        self.assertEqual(doc._nkeys, 2)
+        # ...and evicted like the others
+        a = obj['a']
+        self.assertEqual(c['y'].value(), [4])
+        self.assertEqual(a['x'].value(), 1)
+        self.assertEqual(list(doc._keys), [c.node.pos, a.node.pos])
+        self.assertEqual(doc._nkeys, 2)
+
+    def test_save_index(self):
+        obj = {'foo': [0, 1, {'bar': 'baz'}], 'qux': [True, None]}
+        tmp = tempfile.mkdtemp()
+        try:
+            src, idx = os.path.join(tmp, 'doc'), os.path.join(tmp, 'idx')
+            with open(src, 'w') as fp:
+                fp.write(pyjson.dumps(obj))
+            with open(src) as fp:
+                json.Document(fp.read(), self.BACKEND).save_index(idx)
+
+            doc = json.Document.open(src, idx)
+            self.assertEqual(pyjson.loads(str(doc.root())), obj)
+            jq = json.Query('.foo | .[2] | .bar')
+            self.assertEqual(
+                [str(res) for res in jq.execute(doc.root())],
+                ['"baz"'],
+            )
+
+            with open(src, 'r+') as fp:
+                fp.write('{"fox"')
+            self.assertRaises(ValueError, json.Document.open, src, idx)
+            with open(src, 'a') as fp:
+                fp.write(' ')
+            self.assertRaises(ValueError, json.Document.open, src, idx)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_buffers(self):
+        obj = {'foo': [0, 1, {'bar': 'baz'}], 'qux': [True, None]}
+        src = pyjson.dumps(obj)
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'doc')
+            with open(path, 'w') as fp:
+                fp.write(src)
+            # without numpy, memoryviews are copied to strings
+            docs = [
+                (json.Document(memoryview(src), self.BACKEND),
+                 buffer if numpy else str),
+                (json.Document(bytearray(src), self.BACKEND), buffer),
+                (json.Document.open(path, backend=self.BACKEND), buffer),
+            ]
+            for doc, kind in docs:
+                root = doc.root()
+                self.assertEqual(pyjson.loads(str(root)), obj)
+                self.assertEqual(str(root['foo'][2]['bar']), '"baz"')
+                self.assertIsInstance(doc.idx[0:2], kind)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_utf8(self):
+        obj = {u'caf\xe9': [u'\u2603', 1], u'a"b': u'\\', 'plain': 2}
+        text = pyjson.dumps(obj, ensure_ascii=False)
+        for src in (text.encode('utf-8'), text):
+            doc = json.Document(src, self.BACKEND)
+            root = doc.root()
+            self.assertEqual(root.value(), obj)
+            self.assertEqual(root[u'caf\xe9'].value(), [u'\u2603', 1])
+            self.assertEqual(root[u'caf\xe9'.encode('utf-8')][1].value(), 1)
+            self.assertEqual(root['a"b'].value(), u'\\')
+            self.assertEqual(root['plain'].value(), 2)
+            self.assertEqual(
+                sorted(root),
+                sorted(doc.native(key) for key in obj),
+            )
+            self.assertEqual(type(list(root)[0]), type(src))
+        self.check('.["a\\"b"]', {'a"b': 1}, [1])
+        self.check(
+            '.["caf\\u00e9"]',
+            {u'caf\xe9': True},
+            [True],
+        )
+
+    def test_malformed(self):
+        for src in ('', '1', '[', '[]]', '["]', '["\\"]', '{"a": 1}, 2'):
+            with self.assertRaises(ValueError):
+                list(json.query(src, '.', self.BACKEND))
+
+@unittest.skipUnless(
+    'numpy' in backends.available(),
+    'numpy is not installed'
+)
+class NumpyJSONTests(JSONTests):
+
+    BACKEND = 'numpy'
@@ -0,0 +1,181 @@
+from __future__ import absolute_import
+
+import random
+import unittest
+import json as pyjson
+
+from succinct import scanner
+
+try:
+    from succinct import vectorized
+except ImportError:
+    vectorized = None
+
+def randjson(rnd, depth=0):
+    """return a random json value"""
+    kind = rnd.randrange(6 if depth < 5 else 3)
+    if kind == 0:
+        return rnd.randrange(-1000, 1000)
+    elif kind == 1:
+        return rnd.choice([None, True, False, 1.5])
+    elif kind == 2:
+        return ''.join(rnd.choice('ab"\\\\:,[]{} ') for _ in range(5))
+    elif kind == 3:
+        return [randjson(rnd, depth + 1) for _ in range(rnd.randrange(4))]
+    return dict(
+        (randjson(rnd, 5) if rnd.random() < 0.5 else str(k),
+         randjson(rnd, depth + 1))
+        for k in range(rnd.randrange(4))
+    )
+
+def reference(src):
+    """return the structural positions of json text, one at a time"""
+    positions, instring, escaped = [], False, False
+    for idx, c in enumerate(src):
+        if instring:
+            if escaped:
+                escaped = False
+            elif c == '\\':
+                escaped = True
+            elif c == '"':
+                instring = False
+        elif c == '"':
+            instring = True
+        elif c in '[]{}:,':
+            positions.append(idx)
+    return positions
+
+class ScannerTestCases(object):
+
+    class ScannerTests(unittest.TestCase):
+
+        def scan(self, src):
+            raise NotImplementedError()
+
+        def summary(self):
+            raise NotImplementedError()
+
+        def builder(self):
+            raise NotImplementedError()
+
+        def check(self, src):
+            bv, pos = self.scan(src)
+            if not isinstance(pos, list):
+                pos = (
+                    list(pos.ones())
+                    if hasattr(pos, 'ones') else
+                    pos.tolist()
+                )
+            expected = reference(src)
+            self.assertEqual(pos, expected)
+            self.assertEqual(
+                str(bv),
+                ''.join(
+                    '11' if src[i] in '[{' else
+                    '00' if src[i] in ']}' else
+                    '01'
+                    for i in expected
+                )
+            )
+
+        def test_simple(self):
+            self.check('[]')
+            self.check('{"a": [1, 2, {"b": null}]}')
+            self.check(' [ "x" , "y" ] ')
+            self.check(u'{"\xe9": ["\u2603", 1]}')
+
+        def test_strings(self):
+            self.check(r'["[", "]", "{", "}", ":", ","]')
+            self.check(r'["\"", "\\", "\\\"", "a\\\\", ":\\\"]"]')
+            self.check(r'{"\\\\\\\\": "\\\\\\\"", "x": 1}')
+
+        def test_random(self):
+            rnd = random.Random(0)
+            for _ in range(200):
+                self.check(pyjson.dumps([randjson(rnd)]))
+
+        def test_malformed(self):
+            for src in ('', '1', '[', ']', '[]]', '[[]', ',', '[],[]',
+                        '["]', '["\\"]', '["\\'):
+                self.assertRaises(ValueError, self.scan, src)
+            for src in ('[]]' * 30, '[' * 90, '["' * 50, '[],' * 30):
+                self.assertRaises(
+                    ValueError, scanner.parallel,
+                    src, self.summary(), self.builder(), 2, 64
+                )
+
+        def test_parallel(self):
+            rnd = random.Random(2)
+            src = pyjson.dumps([randjson(rnd) for _ in range(300)])
+            expected = self.scan(src)
+            for size in (64, 128, 640, len(src)):
+                bv, pos = scanner.parallel(
+                    src, self.summary(), self.builder(), 2, size
+                )
+                self.assertEqual(str(bv), str(expected[0]))
+                self.assertEqual(
+                    list(pos.ones()), reference(src)
+                )
+
+        def test_speculate(self):
+            rnd = random.Random(3)
+            src = pyjson.dumps([randjson(rnd) for _ in range(100)])
+            summary = self.summary()
+            for size in (1, 2, 3, 7):
+                chunks, instring = [], False
+                for start in range(0, len(src), size):
+                    escaped = scanner._escaped(src, start)
+                    results = [
+                        summary(src[start:start + size], s, escaped)
+                        for s in (False, True)
+                    ]
+                    chunk, instring = results[instring]
+                    chunks.append(chunk)
+                self.assertFalse(instring)
+                bv, pos = scanner.join(chunks, self.builder())
+                self.assertEqual(list(pos.ones()), reference(src))
+
+class TestScannerTests(ScannerTestCases.ScannerTests):
+
+    def scan(self, src):
+        return scanner.scan(src)
+
+    def summary(self):
+        return scanner.summarize
+
+    def builder(self):
+        return scanner.bitvector.BitVectorBuilder
+
+@unittest.skipUnless(vectorized, 'numpy is not installed')
+class TestNumpyScannerTests(ScannerTestCases.ScannerTests):
+
+    def scan(self, src):
+        return vectorized.scan(src)
+
+    def summary(self):
+        return vectorized.summarize
+
+    def builder(self):
+        return vectorized.NumpyBitVectorBuilder
+
+    def test_builder(self):
+        src = '{"a": [1, 2, {"b": null}]}'
+        bv, pos = vectorized.scan(src, scanner.bitvector.BitVectorBuilder)
+        self.assertNotIsInstance(bv, vectorized.NumpyBitVector)
+        self.assertEqual(str(bv), str(self.scan(src)[0]))
+        self.assertEqual(list(pos.ones()), reference(src))
+
+    def test_chunks(self):
+        rnd = random.Random(1)
+        src = pyjson.dumps([randjson(rnd) for _ in range(200)])
+        expected = reference(src)
+        for size in (1, 2, 3, 7, 64):
+            positions, instring, escaped = [], False, False
+            chars = vectorized.codes(src)
+            for start in range(0, len(chars), size):
+                found, instring, escaped = vectorized.scanchunk(
+                    chars[start:start + size], instring, escaped
+                )
+                positions.extend((found + start).tolist())
+            self.assertEqual(positions, expected)
+            self.assertFalse(instring)
@@ -0,0 +1,143 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from succinct import (
+    storage,
+    backends,
+    bitvector,
+    encoding,
+)
+
+try:
+    from succinct import vectorized
+except ImportError:
+    vectorized = None
+
+from test.encoding import randbp
+
+class StorageTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'index')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def store(self, obj):
+        store = storage.Store()
+        obj._save(store, 'obj')
+        storage.save(self.path, store)
+        return storage.load(self.path)
+
+    def roundtrip(self, obj, *args):
+        return type(obj)._load(self.store(obj), 'obj', *args)
+
+    def backends(self):
+        return [backends.get(name) for name in backends.available()]
+
+    def test_arrays(self):
+        store = storage.Store()
+        store.put('n', 3)
+        store.put('names', ['a', 'b'])
+        for typecode in 'BHILi':
+            store.put(typecode, storage.array.array(typecode, [1, 2, 3]))
+        store.put('empty', storage.array.array('H'))
+        storage.save(self.path, store)
+
+        loaded = storage.load(self.path)
+        self.assertEqual(loaded.get('n'), 3)
+        self.assertEqual(loaded.get('names'), ['a', 'b'])
+        for typecode in 'BHILi':
+            self.assertEqual(list(loaded.get(typecode)), [1, 2, 3])
+        self.assertEqual(len(loaded.get('empty')), 0)
+        self.assertRaises(KeyError, loaded.get, 'missing')
+
+    def test_wide_arrays(self):
+        arrays = {
+            'u64': (storage.ctypes.c_uint64 * 3)(0, 1, (1 << 64) - 1),
+            'i64': (storage.ctypes.c_int64 * 3)(-1, 0, 1),
+        }
+        for be in self.backends():
+            arrays[be.name] = be.eliasfano([3, 5, 1 << 40]).decode()
+        if vectorized:
+            # a numpy array of typecode 'Q'
+            arrays['numpy'] = vectorized.vector(arrays['numpy']).astype('Q')
+        store = storage.Store()
+        for name, values in arrays.items():
+            store.put(name, values)
+        storage.save(self.path, store)
+
+        # the loaded ctypes arrays save again as they were
+        path = self.path + '.copy'
+        storage.save(path, storage.load(self.path))
+        loaded = storage.load(path)
+        for name, values in arrays.items():
+            self.assertEqual(list(loaded.get(name)), list(values))
+        self.assertIn(storage._typecode(arrays['u64']), 'LQ')
+        self.assertIn(storage._typecode(arrays['i64']), 'lq')
+
+    def test_invalid(self):
+        with open(self.path, 'wb') as fp:
+            fp.write('NOTANINDEX' * 4)
+        self.assertRaises(ValueError, storage.load, self.path)
+        with open(self.path, 'wb') as fp:
+            fp.write(storage.PREAMBLE.pack(storage.MAGIC, 999, 0))
+        self.assertRaises(ValueError, storage.load, self.path)
+
+    def test_bitvector(self):
+        rnd = random.Random(0)
+        bits = ''.join(rnd.choice('01') for _ in range(5000))
+        for cls in set(be.bitvector for be in self.backends()):
+            bv = cls(bits)
+            for p in ('1', '10'):
+                bv._index(p)
+            loaded = self.roundtrip(bv)
+            self.assertIsInstance(loaded, cls)
+            self.assertEqual(str(loaded), bits)
+            self.assertEqual(sorted(loaded._indexes), ['1', '10'])
+            for p in ('0', '1', '10', '01'):
+                for k in range(1, 200, 7):
+                    self.assertEqual(loaded.select(p, k), bv.select(p, k))
+                    self.assertEqual(loaded.rank(p, k), bv.rank(p, k))
+
+    def test_parentheses(self):
+        rnd = random.Random(1)
+        bits = encoding.tobits(randbp(rnd, 2000))
+        for be in self.backends():
+            enc = be.parentheses(be.bitvector(bits))
+            loaded = self.roundtrip(enc, be.bitvector)
+            self.assertIsInstance(loaded, be.parentheses)
+            for _ in range(100):
+                i = rnd.randrange(len(bits))
+                j = rnd.randrange(i, len(bits))
+                self.assertEqual(loaded.close(i) if bits[i] == '1' else
+                                 loaded.open(i),
+                                 enc.close(i) if bits[i] == '1' else
+                                 enc.open(i))
+                self.assertEqual(loaded.firstmin(i, j), enc.firstmin(i, j))
+
+        class Small(encoding.RangeMinMaxParentheses):
+            BLOCK = 8
+
+        self.assertRaises(
+            ValueError, Small._load,
+            self.store(encoding.RangeMinMaxParentheses(
+                bitvector.PackedBitVector(bits)
+            )), 'obj'
+        )
+
+    def test_eliasfano(self):
+        rnd = random.Random(2)
+        values = sorted(rnd.randrange(100000) for _ in range(3000))
+        classes = [be.eliasfano for be in self.backends()]
+        classes.append(encoding.PartitionedEliasFano)
+        for cls in classes:
+            ef = cls(values)
+            loaded = self.roundtrip(ef)
+            self.assertIsInstance(loaded, cls)
+            self.assertEqual(list(loaded), values)
+            self.assertEqual(loaded.next_geq(50000), ef.next_geq(50000))
@@ -1,6 +1,13 @@
+import random
 import unittest
+import itertools
 
-from succinct import tree
+from succinct import (
+    tree,
+    backends,
+)
+from succinct.bitvector import PackedBitVector
+from succinct.encoding import RangeMinMaxParentheses
 
 from test import (
     bitvector,
@@ -10,6 +17,16 @@ from test import (
 def getpos(n):
     return n if n is None else n.pos
 
+def randtree(n, seed, closing=0.5):
+    rand, bits, depth = random.Random(seed), ['('], 1
+    for _ in xrange(n):
+        bits.append('(')
+        depth += 1
+        while depth > 1 and rand.random() < closing:
+            bits.append(')')
+            depth -= 1
+    return ''.join(bits) + ')' * depth
+
 class TreeTestCases(object):
 
     class TreeTests(unittest.TestCase):
@@ -36,6 +53,29 @@ class TreeTestCases(object):
         def construct(self, sequence):
             raise NotImplementedError()
 
+        def levels(self):
+            """return the tree, without and with its levels indexed"""
+            indexed = self.construct(self.TREE)
+            indexed.indexlevels()
+            return self.construct(self.TREE), indexed
+
+        def test_levelorder(self):
+            t = self.construct(self.TREE)
+            depths = [1, 2, 3, 3, 3, 4, 2, 2, 3, 4, 4]
+            order = sorted(
+                zip(self.PREORDER, depths, range(11)),
+                key=lambda node: (node[1], node[0])
+            )
+            self.assertEqual(list(t.levelorder()), order)
+            self.assertEqual(list(t.levelorder(3)), order[4:])
+            self.assertEqual(list(t.levelorder(5)), [])
+            self.assertEqual(len(t.levels), 4)
+            self.assertEqual(
+                [t.levels.count(d) for d in range(1, 5)],
+                [1, 3, 4, 3]
+            )
+            self.assertEqual(t.height(), 3)
+
         def test_root(self):
             t = self.construct(self.TREE)
             self.assertEqual(t.root().pos, 0)
@@ -72,6 +112,76 @@ class TreeTestCases(object):
                 [n.pos for n in t[2:]],
                 m[2:]
             )
+            self.assertEqual(
+                [n.pos for n in t[8:2:-1]],
+                m[8:2:-1]
+            )
+            self.assertEqual(
+                [n.pos for n in t.iterate(idx=3, preorder=False)],
+                self.POSTORDER[3:]
+            )
+            self.assertEqual(
+                [n.pos for n in t.iterate(slice(7, 1, -1), preorder=False)],
+                self.POSTORDER[7:1:-1]
+            )
+            self.assertEqual(
+                [n.pos for n in t.iterate(slice(1, 9, 3), preorder=False)],
+                self.POSTORDER[1:9:3]
+            )
+
+        def test_traverse(self):
+            t = self.construct(self.TREE)
+            depths = dict(zip(
+                self.PREORDER, [1, 2, 3, 3, 3, 4, 2, 2, 3, 4, 4]
+            ))
+
+            def nodes(positions):
+                return [(p, depths[p], t.rank(p)) for p in positions]
+
+            self.assertEqual(list(t.traverse()), nodes(self.PREORDER))
+            self.assertEqual(
+                list(t.traverse(preorder=False)),
+                nodes(self.POSTORDER)
+            )
+            self.assertEqual(
+                list(t.traverse(reverse=True)),
+                nodes(self.PREORDER[::-1])
+            )
+            self.assertEqual(
+                list(t.traverse(preorder=False, reverse=True)),
+                nodes(self.POSTORDER[::-1])
+            )
+            for reverse in (False, True):
+                for preorder in (False, True):
+                    leaves = nodes(self.LEAFORDER)
+                    self.assertEqual(
+                        list(t.traverse(preorder=preorder, reverse=reverse,
+                                        leaves=True)),
+                        leaves[::-1] if reverse else leaves
+                    )
+            self.assertEqual(list(t.traverse(depth=3)), nodes([2, 4, 6, 14]))
+            self.assertEqual(
+                list(t.traverse(leaves=True, depth=4)),
+                nodes([7, 15, 17])
+            )
+            self.assertEqual(list(t.traverse(13)), nodes([13, 14, 15, 17]))
+            self.assertEqual(
+                list(t.traverse(1, preorder=False, reverse=True)),
+                nodes([1, 6, 7, 4, 2])
+            )
+            self.assertEqual(list(t.traverse(11)), nodes([11]))
+            self.assertRaises(ValueError, t.traverse, 3)
+
+            # bounded by the subtree, and longer than a chunk
+            t.SCAN = 3
+            self.assertEqual(
+                list(t.traverse(14, reverse=True)),
+                nodes([17, 15, 14])
+            )
+            self.assertEqual(
+                list(t.traverse(1, preorder=False)),
+                nodes([2, 4, 7, 6, 1])
+            )
 
         def test_preorder(self):
             t = self.construct(self.TREE)
@@ -181,6 +291,21 @@ class TreeTestCases(object):
                     [c.pos for c in n.children()],
                     m[k]
                 )
+                self.assertEqual(
+                    [c.pos for c in n.children(1)],
+                    m[k][1:]
+                )
+                for i in [0, 1, 2, 1, 0, 2, 3, -1]:
+                    if 0 <= i < len(m[k]):
+                        self.assertEqual(n.child(i).pos, m[k][i])
+                    else:
+                        self.assertRaises(IndexError, n.child, i)
+
+            # beyond the siblings walked from the last child
+            n = self.construct('(' + '()' * 40 + ')').root()
+            for i in [0, 30, 35, 39, 2]:
+                self.assertEqual(n.child(i).pos, 1 + 2 * i)
+            self.assertRaises(IndexError, n.child, 40)
 
         def test_nextsibling(self):
             t = self.construct(self.TREE)
@@ -200,6 +325,60 @@ class TreeTestCases(object):
                     prv
                 )
 
+        def test_positions(self):
+            t = self.construct(self.TREE)
+            parents = [None, 0, 1, 1, 1, 6, 0, 0, 13, 14, 14]
+            first = [1, 2, None, None, 7, None, None, 14, 15, None, None]
+            last = [13, 6, None, None, 7, None, None, 14, 17, None, None]
+            nxt = [None, 11, 4, 6, None, None, 13, None, None, 17, None]
+            prv = [None, None, None, 2, 4, None, 1, 11, None, None, 15]
+            for k, pos in enumerate(self.PREORDER):
+                self.assertEqual(t.parentpos(pos), parents[k])
+                self.assertEqual(t.firstchildpos(pos), first[k])
+                self.assertEqual(t.lastchildpos(pos), last[k])
+                self.assertEqual(t.nextsiblingpos(pos), nxt[k])
+                self.assertEqual(t.prevsiblingpos(pos), prv[k])
+
+        def test_cursor(self):
+            t = self.construct(self.TREE)
+            depths = [1, 2, 3, 3, 3, 4, 2, 2, 3, 4, 4]
+            c = t.cursor()
+            visited = [(c.pos, c.depth)]
+            while c.advance():
+                visited.append((c.pos, c.depth))
+            self.assertEqual(visited, zip(self.PREORDER, depths))
+            self.assertEqual((c.pos, c.depth), (17, 4))
+
+            c = t.cursor(1)
+            visited = [c.pos]
+            while c.advance(top=1):
+                visited.append(c.pos)
+            self.assertEqual(visited, [1, 2, 4, 6, 7])
+            self.assertEqual(c.pos, 7)
+            c = t.cursor(1)
+            self.assertTrue(c.skip())
+            self.assertEqual(c.pos, 11)
+            self.assertFalse(c.firstchild())
+            self.assertFalse(c.skip(top=11))
+            self.assertEqual((c.pos, c.depth), (11, 2))
+            self.assertTrue(c.lastchild() or c.parent())
+            self.assertTrue(c.lastchild())
+            self.assertEqual((c.pos, c.depth), (13, 2))
+            self.assertTrue(c.prevsibling())
+            self.assertEqual(c.node().pos, 11)
+            self.assertRaises(ValueError, t.cursor, 3)
+
+            # top is not an ancestor of the cursor
+            c = t.cursor(17)
+            self.assertFalse(c.skip(top=1))
+            self.assertEqual((c.pos, c.depth), (17, 4))
+            self.assertFalse(c.advance(top=1))
+            self.assertEqual((c.pos, c.depth), (17, 4))
+            c = t.cursor(7)
+            self.assertTrue(c.skip(top=11))
+            self.assertEqual(c.pos, 11)
+            self.assertFalse(hasattr(c, 'next'))
+
         def test_ancestor(self):
             t = self.construct(self.TREE)
             m = [
@@ -222,6 +401,23 @@ class TreeTestCases(object):
                         pos
                     )
 
+        def test_ancestors(self):
+            # a deep tree exercises the jump pointers
+            for sequence in (self.TREE, randtree(150, 5, 0.3)):
+                t, indexed = self.construct(sequence), self.construct(sequence)
+                indexed.indexancestors()
+                for n, m in itertools.islice(zip(t, indexed), 0, None, 7):
+                    path = list(t.rootpath(n.pos))
+                    self.assertEqual(len(path), n.depth())
+                    self.assertEqual(list(indexed.rootpath(m.pos)), path)
+                    self.assertEqual([k.pos for k in m.path()], path[::-1])
+                    for d in xrange(-1, n.depth() + 1):
+                        self.assertEqual(
+                            getpos(m.ancestor(d)),
+                            path[d] if 0 <= d < len(path) else None
+                        )
+                    self.assertEqual(getpos(m.parent()), getpos(n.parent()))
+
         def test_lca(self):
             t = self.construct(self.TREE)
             m = {
@@ -359,22 +555,22 @@ class TreeTestCases(object):
                     )
 
         def test_levelnext(self):
-            t = self.construct(self.TREE)
-            m = (None, 11, 4, 6, 14, 15, 13, None, None, 17, None)
-            for n, pos in zip(t, m):
-                self.assertEqual(
-                    getpos(n.levelnext()),
-                    pos
-                )
+            for t in self.levels():
+                m = (None, 11, 4, 6, 14, 15, 13, None, None, 17, None)
+                for n, pos in zip(t, m):
+                    self.assertEqual(
+                        getpos(n.levelnext()),
+                        pos
+                    )
 
         def test_levelprev(self):
-            t = self.construct(self.TREE)
-            m = (None, None, None, 2, 4, None, 1, 11, 6, 7, 15)
-            for n, pos in zip(t, m):
-                self.assertEqual(
-                    getpos(n.levelprev()),
-                    pos
-                )
+            for t in self.levels():
+                m = (None, None, None, 2, 4, None, 1, 11, 6, 7, 15)
+                for n, pos in zip(t, m):
+                    self.assertEqual(
+                        getpos(n.levelprev()),
+                        pos
+                    )
 
         def test_deepestnode(self):
             t = self.construct(self.TREE)
@@ -404,22 +600,22 @@ class TreeTestCases(object):
                 )
 
         def test_levelleftmost(self):
-            t = self.construct(self.TREE)
-            m = ((0, None), (1, 0), (2, 1), (3, 2), (4, 7), (5, None))
-            for d, pos in (m):
-                self.assertEqual(
-                    getpos(t.levelleftmost(d)),
-                    pos
-                )
+            for t in self.levels():
+                m = ((0, None), (1, 0), (2, 1), (3, 2), (4, 7), (5, None))
+                for d, pos in (m):
+                    self.assertEqual(
+                        getpos(t.levelleftmost(d)),
+                        pos
+                    )
 
         def test_levelrightmost(self):
-            t = self.construct(self.TREE)
-            m = ((0, None), (1, 0), (2, 13), (3, 14), (4, 17), (5, None))
-            for d, pos in (m):
-                self.assertEqual(
-                    getpos(t.levelrightmost(d)),
-                    pos
-                )
+            for t in self.levels():
+                m = ((0, None), (1, 0), (2, 13), (3, 14), (4, 17), (5, None))
+                for d, pos in (m):
+                    self.assertEqual(
+                        getpos(t.levelrightmost(d)),
+                        pos
+                    )
 
 class TestTreeTests(TreeTestCases.TreeTests):
 
@@ -431,3 +627,218 @@ class TestTreeTests(TreeTestCases.TreeTests):
                 )
             )
         )
+
+class TestPackedTreeTests(TreeTestCases.TreeTests):
+
+    def construct(self, sequence):
+        return tree.Navigator(
+            encoding.BalancedParentheses(
+                PackedBitVector(
+                    sequence.replace('(', '1').replace(')', '0')
+                )
+            )
+        )
+
+class TestRangeMinMaxTreeTests(TreeTestCases.TreeTests):
+
+    class RangeMinMaxParentheses(RangeMinMaxParentheses):
+        BLOCK = 8
+
+    def construct(self, sequence):
+        return tree.Navigator(
+            self.RangeMinMaxParentheses(
+                PackedBitVector(
+                    sequence.replace('(', '1').replace(')', '0')
+                )
+            )
+        )
+
+class TestPythonBackendTreeTests(TreeTestCases.TreeTests):
+
+    BACKEND = 'python'
+
+    def construct(self, sequence):
+        return tree.Navigator(sequence, backend=self.BACKEND)
+
+@unittest.skipUnless(
+    'numpy' in backends.available(),
+    'numpy is not installed'
+)
+class TestNumpyBackendTreeTests(TestPythonBackendTreeTests):
+
+    BACKEND = 'numpy'
+
+    def test_lca_many(self):
+        # large enough to span several blocks of the sparse table
+        for sequence in (self.TREE, randtree(20000, 1)):
+            t = self.construct(sequence)
+            nodes = [pos for pos, _, _ in t.traverse()]
+            rand = random.Random(2)
+            a = [rand.choice(nodes) for _ in xrange(300)]
+            b = [rand.choice(nodes) for _ in xrange(300)]
+            self.assertEqual(
+                t.lca_many(a, b).tolist(),
+                [t.node(i).lca(t.node(j)).pos for i, j in zip(a, b)]
+            )
+            self.assertEqual(t.lca_many([], []).tolist(), [])
+
+    def test_minima(self):
+        # small blocks and superblocks, with deep trees whose ancestors
+        # open several superblocks back
+        from succinct import vectorized
+        minima = type('ExcessMinima', (vectorized.ExcessMinima,), {
+            'WORDS': 1, 'BLOCKS': 2,
+        })
+        for closing in (0.5, 0.3):
+            t = self.construct(randtree(3000, 5, closing))
+            t._minima = minima(t.enc)
+            nodes = [pos for pos, _, _ in t.traverse()]
+            rand = random.Random(6)
+            a = [rand.choice(nodes) for _ in xrange(300)]
+            b = [rand.choice(nodes) for _ in xrange(300)]
+            self.assertEqual(
+                t.lca_many(a, b).tolist(),
+                [t.node(i).lca(t.node(j)).pos for i, j in zip(a, b)]
+            )
+            d = [rand.randint(0, 400) for _ in a]
+            expected = [getpos(t.node(p).ancestor(k)) for p, k in zip(a, d)]
+            self.assertEqual(
+                t.ancestor_many(a, d).tolist(),
+                [-1 if p is None else p for p in expected]
+            )
+        # depths beyond the range of the 16-bit offsets
+        t = self.construct('(' * 40000 + ')' * 40000)
+        pos = range(1, 40000, 97)
+        self.assertEqual(t.ancestor_many(pos, 1).tolist(), range(0, 39999, 97))
+        self.assertEqual(t.lca_many(pos, [39999] * len(pos)).tolist(), pos)
+
+    def test_to_arrays(self):
+        for sequence in (self.TREE, randtree(2000, 6)):
+            t = self.construct(sequence)
+            arrays = t.to_arrays()
+            self.assertEqual(
+                sorted(arrays), ['degree', 'depth', 'parent', 'pos', 'size']
+            )
+            self.assertEqual(arrays['pos'].tolist(), [n.pos for n in t])
+            self.assertEqual(arrays['depth'].tolist(), [n.depth() for n in t])
+            self.assertEqual(arrays['size'].tolist(), [n.size() for n in t])
+            self.assertEqual(
+                arrays['degree'].tolist(),
+                [n.degree() for n in t]
+            )
+            self.assertEqual(
+                arrays['parent'].tolist(),
+                [n.parent().rank() if n.pos else -1 for n in t]
+            )
+            self.assertEqual(
+                t.to_arrays(['size'])['size'].tolist(),
+                arrays['size'].tolist()
+            )
+        self.assertRaises(ValueError, t.to_arrays, ['height'])
+
+    def test_to_arrays_chunks(self):
+        # carry the open nodes across many small chunks
+        from succinct import vectorized
+        for closing in (0.5, 0.3):
+            t = self.construct(randtree(5000, 8, closing))
+            arrays = t.to_arrays()
+            chunk, vectorized.CHUNK = vectorized.CHUNK, 1
+            try:
+                chunked = t.to_arrays()
+            finally:
+                vectorized.CHUNK = chunk
+            for field in arrays:
+                self.assertEqual(
+                    chunked[field].tolist(), arrays[field].tolist()
+                )
+
+    def test_rank_many(self):
+        for sequence in (self.TREE, randtree(20000, 7)):
+            t = self.construct(sequence)
+            nodes = [pos for pos, _, _ in t.traverse()]
+            self.assertEqual(
+                t.rank_many(nodes).tolist(), range(len(nodes))
+            )
+            self.assertEqual(t.rank_many([]).tolist(), [])
+            self.assertIsNone(t._minima)
+
+    def test_ancestor_many(self):
+        for sequence in (self.TREE, randtree(20000, 3)):
+            t = self.construct(sequence)
+            nodes = [pos for pos, _, _ in t.traverse()]
+            rand = random.Random(4)
+            pos = [rand.choice(nodes) for _ in xrange(300)]
+            d = [rand.randint(-1, 6) for _ in pos]
+            expected = [getpos(t.node(p).ancestor(k)) for p, k in zip(pos, d)]
+            self.assertEqual(
+                t.ancestor_many(pos, d).tolist(),
+                [-1 if p is None else p for p in expected]
+            )
+            self.assertEqual(
+                t.ancestor_many(pos, 1).tolist(),
+                [t.parentpos(p) if p else -1 for p in pos]
+            )
+
+class LabeledTreeTests(unittest.TestCase):
+
+    TREE = TreeTestCases.TreeTests.TREE
+    PREORDER = TreeTestCases.TreeTests.PREORDER
+
+    def construct(self):
+        nav = tree.Navigator(self.TREE, backend='python')
+        return tree.Tree(nav, {
+            'id': range(1, 12),
+            'weight': [k / 4.0 for k in range(11)],
+            'name': ['a', 'b', 'a', 'c', 'b', 'a', 'a', 'c', 'c', 'a', 'b'],
+        })
+
+    def test_columns(self):
+        t = self.construct()
+        self.assertEqual(t['id'].array.typecode, 'B')
+        self.assertEqual(t['weight'].array.typecode, 'd')
+        self.assertEqual(t['name'].array.typecode, 'B')
+        self.assertEqual(t['name'].values, ['a', 'b', 'c'])
+        self.assertEqual(
+            t.addcolumn('delta', [-200] + [0] * 10).array.typecode,
+            'h'
+        )
+        self.assertEqual(
+            t.addcolumn('big', [1 << 40] * 11).array.typecode,
+            'L'
+        )
+        self.assertEqual(
+            t.addcolumn('small', [1] * 11, 'i').array.typecode,
+            'i'
+        )
+        self.assertEqual(list(t.columns), [
+            'id', 'weight', 'name', 'delta', 'big', 'small'
+        ])
+        self.assertRaises(ValueError, t.addcolumn, 'short', [1, 2])
+
+    def test_labels(self):
+        t = self.construct()
+        for k, pos in enumerate(self.PREORDER):
+            self.assertEqual(t.label(pos, 'id'), k + 1)
+            self.assertEqual(t.labels(pos), {
+                'id': k + 1,
+                'weight': k / 4.0,
+                'name': 'abacbaaccab'[k],
+            })
+
+    @unittest.skipUnless(
+        'numpy' in backends.available(),
+        'numpy is not installed'
+    )
+    def test_gather(self):
+        t = self.construct()
+        pos = [13, 0, 7, 7]
+        self.assertEqual(t.gather('id', pos).tolist(), [8, 1, 6, 6])
+        self.assertEqual(
+            t.gather('weight', pos).tolist(),
+            [1.75, 0.0, 1.25, 1.25]
+        )
+        self.assertEqual(
+            t.gather('name', pos).tolist(),
+            ['c', 'a', 'a', 'a']
+        )
+        self.assertEqual(t.gather('id', []).tolist(), [])